@@ -8,30 +8,1652 @@ from mcp.server.lowlevel import Server
 import anyio
 import traceback
 from wand.image import Image
-import tempfile
+from wand.resource import genesis
+from wand.version import formats, QUANTUM_DEPTH, MAGICK_HDRI
 import base64
-import datetime
+import math
+import collections
+import pathlib
+import shutil
+import queue
+import logging
+import logging.handlers
+import threading
+import atexit
+import uuid
 
 # ログファイルの設定
 log_file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "imagemagick_server_log.txt")
+# ログは標準のloggingで出力し、ファイルへの書き込みはQueueListenerのスレッドが行う
+# （呼び出し側はキューに積むだけで、ログファイルは起動時に一度だけ開く）
+logger = logging.getLogger("imagemagick_mcp")
+# 詳細なデバッグログは --log-level DEBUG または IMAGEMAGICK_MCP_DEBUG=1 のときのみ出力する
+logger.setLevel(logging.DEBUG if os.environ.get("IMAGEMAGICK_MCP_DEBUG") == "1" else logging.INFO)
+logger.propagate = False
+log_file_handler = logging.FileHandler(log_file_path, encoding="utf-8")
+log_file_handler.setFormatter(logging.Formatter("[%(asctime)s] %(message)s", datefmt="%Y-%m-%d %H:%M:%S"))
+log_queue = queue.SimpleQueue()
+logger.addHandler(logging.handlers.QueueHandler(log_queue))
+log_listener = logging.handlers.QueueListener(log_queue, log_file_handler)
+log_listener.start()
+# 終了時に未書き込みのログを書き出してからスレッドを止める
+atexit.register(log_listener.stop)
 
 def log_to_file(message):
     """ログをファイルに出力する"""
-    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    with open(log_file_path, "a", encoding="utf-8") as log_file:
-        log_file.write(f"[{timestamp}] {message}\n")
+    logger.info(message)
+
+# 拡張子からMIMEタイプへの対応表
+MIME_TYPES = {
+    ".png": "image/png",
+    ".gif": "image/gif",
+    ".bmp": "image/bmp",
+    ".tiff": "image/tiff",
+    ".tif": "image/tiff",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".webp": "image/webp",
+}
+
+def encode_inline_image(img, file_ext):
+    """画像をファイルに書き出さずにエンコードし、ImageContentとして返す"""
+    # 拡張子がない場合は読み込んだ画像のフォーマットをそのまま使う
+    image_format = file_ext.lstrip('.') or img.format
+    # 変換後の複製からエンコード結果とMIMEタイプの両方を取得する
+    # （元の画像のmimetypeは変換前の形式のままのため使わない）
+    with img.convert(image_format) as out:
+        blob = out.make_blob()
+        # 対応表にない形式のみImageMagickに問い合わせる
+        mime_type = MIME_TYPES.get(file_ext.lower()) or out.mimetype
+    return types.ImageContent(
+        type="image",
+        data=base64.b64encode(blob).decode("ascii"),
+        mimeType=mime_type
+    )
+
+def output_resource_link(output_path):
+    """出力ファイルを指すResourceLinkを作成する（画像データ自体は含めない）"""
+    path = pathlib.Path(output_path).resolve()
+    return types.ResourceLink(
+        type="resource_link",
+        uri=path.as_uri(),
+        name=path.name,
+        mimeType=MIME_TYPES.get(path.suffix.lower())
+    )
+
+# デコード済み画像のキャッシュ（同じファイルに続けてツールを適用する場合の再デコードを省く）
+DECODED_CACHE_SIZE = 4
+# キャッシュに保持するデコード済み画素データの上限（バイト、--decoded-cache-mbで変更、0で無効）
+# この上限を超える画像はキャッシュしない
+decoded_cache_max_bytes = 256 * 1024 * 1024
+decoded_cache = collections.OrderedDict()
+decoded_cache_bytes = 0
+decoded_cache_lock = threading.Lock()
+
+# 画素の1チャンネルあたりのバイト数（HDRI版は浮動小数点で保持する）
+if MAGICK_HDRI:
+    QUANTUM_BYTES = 4 if QUANTUM_DEPTH <= 16 else 8
+else:
+    QUANTUM_BYTES = QUANTUM_DEPTH // 8
+
+def decoded_image_bytes(img):
+    """デコード済み画像の画素データのおおよそのサイズ（幅×高さ×チャンネル数×チャンネルのバイト数×フレーム数）"""
+    if img.colorspace == 'gray':
+        channels = 1
+    elif img.colorspace == 'cmyk':
+        channels = 4
+    else:
+        channels = 3
+    if img.alpha_channel:
+        channels += 1
+    return img.width * img.height * channels * QUANTUM_BYTES * max(len(img.sequence), 1)
+
+def open_image(image_path, image_stat=None):
+    """画像を読み込む。同じファイルをデコード済みであればその複製を返す
+
+    image_statには呼び出し元で取得済みのos.statの結果を渡せる
+    """
+    global decoded_cache_bytes
+    st = image_stat if image_stat is not None else os.stat(image_path)
+    key = (os.path.abspath(image_path), st.st_mtime_ns, st.st_size)
+    with decoded_cache_lock:
+        cached = decoded_cache.get(key)
+        if cached is not None:
+            decoded_cache.move_to_end(key)
+            # 複製は画素データを共有し、変更時にのみコピーされる
+            return cached[0].clone()
+    img = Image(filename=image_path)
+    size = decoded_image_bytes(img)
+    if size > decoded_cache_max_bytes:
+        # 大きな画像をキャッシュすると処理後もメモリに残り続けるため、キャッシュしない
+        logger.debug("DEBUG: Not caching decoded image (%s bytes): %s", size, image_path)
+        return img
+    with decoded_cache_lock:
+        if key not in decoded_cache:
+            decoded_cache[key] = (img.clone(), size)
+            decoded_cache_bytes += size
+            # 件数と画素データの合計サイズの両方が上限内になるまで古いものから破棄する
+            while len(decoded_cache) > DECODED_CACHE_SIZE or decoded_cache_bytes > decoded_cache_max_bytes:
+                _, (evicted, evicted_size) = decoded_cache.popitem(last=False)
+                decoded_cache_bytes -= evicted_size
+                evicted.close()
+    return img
+
+# 処理結果のキャッシュ（ツール名・入力ファイル・パラメータ → 出力ファイル）
+RESULT_CACHE_SIZE = 64
+result_cache = collections.OrderedDict()
+
+def result_cache_key(name, image_path, image_stat, *params):
+    """入力ファイルの更新時刻を含むキャッシュキーを作成する"""
+    # mtimeは秒未満の更新を取りこぼさないようナノ秒単位で使う
+    return (name, os.path.abspath(image_path), image_stat.st_mtime_ns) + params
+
+def get_cached_result(key):
+    """キャッシュ済みの出力ファイルが書き換えられずに残っていればそのパスを返す"""
+    entry = result_cache.get(key)
+    if entry is None:
+        return None
+    output_path, output_signature = entry
+    try:
+        if output_file_signature(os.stat(output_path)) != output_signature:
+            raise FileNotFoundError(output_path)
+    except FileNotFoundError:
+        del result_cache[key]
+        return None
+    result_cache.move_to_end(key)
+    return output_path
+
+def output_file_signature(st):
+    """出力ファイルが書き換えられていないかの判定に使う値（更新時刻の分解能が粗いファイルシステムでも
+    置き換えを検出できるよう、inode番号とサイズも含める）"""
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+def store_cached_result(key, output_path, output_signature=None):
+    """出力ファイルをキャッシュに登録する（出力ファイルが存在しない場合は登録しない）
+
+    output_signatureには、書き込み時にsave_outputなどが返した値を渡す。
+    後からstatすると、同じ出力パスに別のパラメータで書き込まれた結果を登録してしまうことがある
+    """
+    if output_signature is None:
+        try:
+            output_signature = output_file_signature(os.stat(output_path))
+        except FileNotFoundError:
+            log_to_file(f"Output file not found, not caching: {output_path}")
+            return
+    result_cache[key] = (output_path, output_signature)
+    result_cache.move_to_end(key)
+    while len(result_cache) > RESULT_CACHE_SIZE:
+        result_cache.popitem(last=False)
+
+# 出力パスごとのロック（同じ出力ファイルへの書き込みとその直後のstatを他の書き込みと重ねない）
+output_locks = {}
+output_locks_lock = threading.Lock()
+
+def output_lock(output_path):
+    """出力パスに対応するロックを返す"""
+    with output_locks_lock:
+        return output_locks.setdefault(os.path.abspath(output_path), threading.Lock())
+
+def replace_output(output_path, write):
+    """write(一時ファイルのパス)で書き出したファイルを出力パスに置き換え、output_file_signatureの値を返す
+
+    同じディレクトリの一時ファイルに書き出してからos.replaceで置き換えるため、
+    書き込み途中のファイルや複数の書き込みが混ざったファイルが出力パスに現れることはない
+    """
+    path = pathlib.Path(output_path)
+    # ImageMagickは拡張子で出力形式を決めるため、一時ファイルにも同じ拡張子を付ける
+    tmp_path = str(path.with_name(f".{path.stem}.{uuid.uuid4().hex}.tmp{path.suffix}"))
+    with output_lock(output_path):
+        try:
+            write(tmp_path)
+            os.replace(tmp_path, output_path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        return output_file_signature(os.stat(output_path))
+
+def save_output(img, output_path):
+    """画像を出力パスに保存し、output_file_signatureの値を返す"""
+    return replace_output(output_path, lambda tmp_path: img.save(filename=tmp_path))
+
+# 以下のapply_*関数は読み込み済みの画像をその場で変更する（各ツールとprocess_pipelineで共用する）
+def apply_threshold(img, threshold_float):
+    """読み込み済みの画像を二値化する"""
+    # thresholdはカラー画像に対しても各画素の輝度で判定するため、
+    # 事前のグレースケール変換（画素全体の余分な1パス）は行わない
+    img.threshold(threshold_float)
+
+def apply_auto_threshold(img, method):
+    """読み込み済みの画像を、ヒストグラムから求めたしきい値で二値化する"""
+    # auto_thresholdはImageMagick 7.0.8-41以降でのみ使用できる
+    img.auto_threshold(method=method)
+
+def apply_blur(img, radius_float, sigma_float):
+    """読み込み済みの画像をぼかす（sigmaが0の場合は画像が変化しないため何もしない）"""
+    if sigma_float > 0.0:
+        img.blur(radius=radius_float, sigma=sigma_float)
+
+def apply_grayscale(img):
+    """読み込み済みの画像をグレースケールに変換する"""
+    # 元からGRAY色空間の画像は変換済みのため、画素全体の変換処理を省略する
+    if img.colorspace == 'gray':
+        log_to_file("Image is already grayscale, skipping conversion")
+    else:
+        img.type = 'grayscale'
+
+# 色相の変更量（度）をmodulateの色相パラメータに変換する係数
+HUE_SHIFT_SCALE = 100.0 / 360.0
+
+def apply_modulate(img, hue_shift_float, brightness_float, saturation_float):
+    """読み込み済みの画像の色相・輝度・彩度を変更する"""
+    # modulate関数のパラメータ:
+    # - brightness: 輝度（0〜200、100が元の輝度）
+    # - saturation: 彩度（0〜200、100が元の彩度）
+    # - hue: 色相（0〜200、100が元の色相）
+    # 色相の変更は100 + hue_shift * 100 / 360 で変換（HUE_SHIFT_SCALE）
+    # すべて元の値の場合は画素処理を省略する
+    if hue_shift_float == 0.0 and brightness_float == 100.0 and saturation_float == 100.0:
+        log_to_file("Color parameters are identity, skipping modulate")
+    else:
+        img.modulate(
+            brightness=brightness_float,
+            saturation=saturation_float,
+            hue=100.0 + hue_shift_float * HUE_SHIFT_SCALE
+        )
+
+# 二値化結果は入力形式に関わらずPNGで出力する（JPEGなどでは劣化し、サイズも大きくなる）
+BINARIZE_OUTPUT_EXT = ".png"
+
+# 二値化のしきい値の決め方（threshold: 指定値を使う、otsu: 大津の方法でヒストグラムから求める）
+BINARIZE_METHODS = ("threshold", "otsu")
+
+def binarize_image_sync(image_path, image_stat, output_path, threshold_float, method, inline):
+    """画像を二値化する（ワーカースレッドで実行される）
+
+    inlineが指定された場合はファイルに保存せず、ImageContentを返す
+    """
+    # Process the image with ImageMagick using Wand
+    with open_image(image_path, image_stat) as img:
+        # PNGは複数フレームを1ファイルに保存できず、フレームごとに別名のファイルになるため、
+        # 複数フレームの画像（アニメーションGIF、複数ページのTIFFなど）は最初のフレームのみを二値化する
+        if len(img.sequence) > 1:
+            log_to_file(f"Image has {len(img.sequence)} frames, binarizing only the first frame")
+            del img.sequence[1:]
+            img.iterator_first()
+        if method == "otsu":
+            apply_auto_threshold(img, method)
+        else:
+            apply_threshold(img, threshold_float)
+        # 二値画像は1ビットで表現できるため、深度1で出力する
+        img.depth = 1
+        # 透過のない画像は1ビットのグレースケールPNG（1画素1ビットに詰めた形式）として書き出すよう
+        # エンコーダに明示する（RGBやパレット形式と判定されて大きく書き出されないようにする）
+        if not img.alpha_channel:
+            img.options['png:bit-depth'] = '1'
+            img.options['png:color-type'] = '0'
+        # 二値画像には行ごとのフィルタ（差分予測）が効かないため、フィルタなしでzlib圧縮する
+        # （既定の適応フィルタは行ごとに全フィルタを試すため、大きな画像ではエンコードが遅くなる）
+        img.options['png:compression-filter'] = '0'
+        if inline:
+            # ファイルには保存せず、エンコード結果をそのまま返す
+            return encode_inline_image(img, BINARIZE_OUTPUT_EXT)
+        # Save the processed image
+        return save_output(img, output_path)
+
+def modify_colors_sync(image_path, image_stat, output_path, file_ext, hue_shift_float, brightness_float, saturation_float, inline):
+    """画像の色相・輝度・彩度を変更する（ワーカースレッドで実行される）
+
+    inlineが指定された場合はファイルに保存せず、ImageContentを返す
+    """
+    # Process the image with ImageMagick using Wand
+    with open_image(image_path, image_stat) as img:
+        # 色相、輝度、彩度を変更
+        apply_modulate(img, hue_shift_float, brightness_float, saturation_float)
+        if inline:
+            # ファイルには保存せず、エンコード結果をそのまま返す
+            return encode_inline_image(img, file_ext)
+        # Save the processed image
+        return save_output(img, output_path)
+
+# ImageMagickが対応している画像形式（小文字）の集合。初回の変換時に一度だけ取得する
+supported_formats = None
+
+def get_supported_formats():
+    """ImageMagickが対応している画像形式の集合を返す"""
+    global supported_formats
+    if supported_formats is None:
+        supported_formats = frozenset(name.lower() for name in formats())
+    return supported_formats
+
+def convert_image_format_sync(image_path, image_stat, output_path, quality_int, inline):
+    """画像のフォーマットを変換する（ワーカースレッドで実行される）
+
+    inlineが指定された場合はファイルに保存せず、ImageContentを返す
+    """
+    # Process the image with ImageMagick using Wand
+    with open_image(image_path, image_stat) as img:
+        # 品質設定（JPEGなどの圧縮フォーマット用）
+        img.compression_quality = quality_int
+
+        if inline:
+            # ファイルには保存せず、出力ファイルと同じ形式でエンコードした結果を返す
+            return encode_inline_image(img, pathlib.PurePath(output_path).suffix)
+        # 画像を保存（フォーマットは拡張子から自動的に判断される）
+        save_output(img, output_path)
+    return None
+
+# 縮小後のサイズのこの倍数より大きい画像は、resizeの前にsampleで間引く
+PRESHRINK_FACTOR = 5
+# ImageMagickのThumbnailImageと同じく、間引き後の縦横がこの画素数未満になる場合や、
+# 縮小後の面積が元の面積のこの割合より大きい場合は間引かない（速度の利点がほとんどなく、エイリアシングが目立つため）
+PRESHRINK_MIN_SIZE = 128
+PRESHRINK_MAX_AREA_RATIO = 0.1
+
+def resize_target_size(original_width, original_height, scale_float, width_float, height_float):
+    """リサイズ後のサイズ(幅, 高さ)を計算する（scale_floatが指定されている場合はwidth・heightより優先する）"""
+    # リサイズ後のサイズを計算
+    if scale_float is not None:
+        # スケールに基づいてリサイズ
+        new_width = int(original_width * scale_float)
+        new_height = int(original_height * scale_float)
+        log_to_file(f"Resizing image using scale factor {scale_float} to {new_width}x{new_height}")
+    else:
+        # widthとheightに基づいてリサイズ
+        if width_float is not None and height_float is not None:
+            # 両方指定されている場合
+            new_width = int(width_float)
+            new_height = int(height_float)
+            log_to_file(f"Resizing image to {width_float}x{height_float}")
+        elif width_float is not None:
+            # widthのみ指定されている場合、アスペクト比を維持
+            aspect_ratio = original_height / original_width
+            new_width = int(width_float)
+            new_height = int(width_float * aspect_ratio)
+            log_to_file(f"Resizing image to width {width_float} (height {new_height} calculated to maintain aspect ratio)")
+        else:
+            # heightのみ指定されている場合、アスペクト比を維持
+            aspect_ratio = original_width / original_height
+            new_width = int(height_float * aspect_ratio)
+            new_height = int(height_float)
+            log_to_file(f"Resizing image to height {height_float} (width {new_width} calculated to maintain aspect ratio)")
+    return new_width, new_height
+
+def apply_resize(img, scale_float, width_float, height_float):
+    """読み込み済みの画像をリサイズする（scale_floatが指定されている場合はwidth・heightより優先する）"""
+    new_width, new_height = resize_target_size(img.width, img.height, scale_float, width_float, height_float)
+    resize_to(img, new_width, new_height)
+
+def resize_to(img, new_width, new_height):
+    """読み込み済みの画像を指定したサイズにリサイズする"""
+    original_width = img.width
+    original_height = img.height
+
+    # リサイズ処理
+    # 大幅に縮小する場合は、先にsampleで縮小後のPRESHRINK_FACTOR倍まで間引く
+    # （フィルターをかける画素数が大幅に減り、十分な余裕を残すため縮小後の見た目はほぼ変わらない）
+    # thumbnailは深度・アルファ・メタデータを変更するため使わず、sampleとresizeはこれらをそのまま残す
+    preshrink_width = new_width * PRESHRINK_FACTOR
+    preshrink_height = new_height * PRESHRINK_FACTOR
+    area_ratio = (new_width * new_height) / (original_width * original_height)
+    if (area_ratio <= PRESHRINK_MAX_AREA_RATIO
+            and PRESHRINK_MIN_SIZE <= preshrink_width < original_width
+            and PRESHRINK_MIN_SIZE <= preshrink_height < original_height):
+        log_to_file(f"Pre-shrinking with sample to {preshrink_width}x{preshrink_height}")
+        img.sample(preshrink_width, preshrink_height)
+    img.resize(new_width, new_height)
+
+def resize_image_sync(image_path, output_path, scale_float, width_float, height_float, inline):
+    """画像をリサイズする（ワーカースレッドで実行される）
+
+    inlineが指定された場合はファイルに保存せず、ImageContentを返す
+    """
+    # リサイズ後のサイズは元のサイズから計算する（縮小デコードした画像のサイズからは計算しない）
+    with Image.ping(filename=image_path) as info:
+        new_width, new_height = resize_target_size(info.width, info.height, scale_float, width_float, height_float)
+        shrinks = 0 < new_width < info.width and 0 < new_height < info.height
+
+    # Process the image with ImageMagick using Wand
+    with Image() as img:
+        # 縦横とも縮小する場合はJPEGデコーダに縮小後の2倍のサイズを伝え、
+        # 必要以上の解像度でのデコードを省略する（JPEG以外では無視される）
+        # 縮小後のサイズちょうどを伝えると、DCTによる縮小がリサイズのフィルターの代わりになり画質が落ちる
+        # 拡大する場合は縮小デコードの意味がないため指定しない
+        if shrinks:
+            img.options['jpeg:size'] = f"{new_width * 2}x{new_height * 2}"
+        img.read(filename=image_path)
+
+        # リサイズ処理
+        resize_to(img, new_width, new_height)
+
+        if inline:
+            # ファイルには保存せず、出力ファイルと同じ形式でエンコードした結果を返す
+            return encode_inline_image(img, pathlib.PurePath(output_path).suffix)
+        # Save the processed image
+        save_output(img, output_path)
+    return None
+
+# 拡張子とImageMagickのフォーマット名が異なるもの
+EXTENSION_FORMATS = {".jpg": "JPEG", ".tif": "TIFF"}
+
+def copy_if_format_matches(image_path, output_path):
+    """ファイルの実際の形式が拡張子と一致する場合のみ、元のファイルをそのままコピーする（ワーカースレッドで実行される）
+
+    コピーした場合は出力ファイルのoutput_file_signatureの値を、コピーしなかった場合はNoneを返す。一致しない場合（拡張子と中身が異なるファイルなど）は、
+    再エンコードして拡張子どおりの形式で出力するよう呼び出し元に任せる
+    """
+    file_ext = pathlib.PurePath(image_path).suffix.lower()
+    expected_format = EXTENSION_FORMATS.get(file_ext, file_ext.lstrip('.').upper())
+    # 形式の判定にはヘッダーのみを読み込む
+    with Image.ping(filename=image_path) as img:
+        detected_format = img.format
+    if not expected_format or detected_format != expected_format:
+        log_to_file(f"Detected format {detected_format} does not match extension '{file_ext}', re-encoding instead of copying")
+        return None
+    return replace_output(output_path, lambda tmp_path: shutil.copyfile(image_path, tmp_path))
+
+def blur_image_sync(image_path, image_stat, output_path, radius_float, sigma_float, inline):
+    """画像をぼかす（ワーカースレッドで実行される）
+
+    inlineが指定された場合はファイルに保存せず、ImageContentを返す
+    """
+    # Process the image with ImageMagick using Wand
+    with open_image(image_path, image_stat) as img:
+        # ぼかし処理を適用
+        apply_blur(img, radius_float, sigma_float)
+        if inline:
+            # ファイルには保存せず、出力ファイルと同じ形式でエンコードした結果を返す
+            return encode_inline_image(img, pathlib.PurePath(output_path).suffix)
+        # 処理した画像を保存
+        save_output(img, output_path)
+    return None
+
+def grayscale_image_sync(image_path, image_stat, output_path, inline):
+    """画像をグレースケールに変換する（ワーカースレッドで実行される）
+
+    inlineが指定された場合はファイルに保存せず、ImageContentを返す
+    """
+    # Process the image with ImageMagick using Wand
+    with open_image(image_path, image_stat) as img:
+        # グレースケールに変換（色空間もGRAYに変換されるため、JPEGは1チャンネルで書き出される）
+        apply_grayscale(img)
+        # PNGはグレースケール形式（アルファありの場合はグレースケール+アルファ）で書き出すよう指定し、
+        # RGBの3チャンネル分のデータをエンコードしないようにする
+        if output_path.lower().endswith(".png"):
+            img.options['png:color-type'] = '4' if img.alpha_channel else '0'
+        if inline:
+            # ファイルには保存せず、出力ファイルと同じ形式でエンコードした結果を返す
+            return encode_inline_image(img, pathlib.PurePath(output_path).suffix)
+        # 処理した画像を保存
+        save_output(img, output_path)
+    return None
+
+def get_image_info_sync(image_path, image_stat):
+    """画像の情報を取得する（ワーカースレッドで実行される）"""
+    # ヘッダーのみを読み込み、画素データはデコードしない
+    with Image.ping(filename=image_path) as img:
+        # resolutionは(x, y)のタプルで返される
+        resolution_x, resolution_y = img.resolution
+        # 基本情報を取得
+        image_info = {
+            "filename": os.path.basename(image_path),
+            "full_path": image_path,
+            "format": img.format,
+            "width": img.width,
+            "height": img.height,
+            "depth": img.depth,
+            "colorspace": img.colorspace,
+            "compression": img.compression,
+            "resolution": {"x": resolution_x, "y": resolution_y},
+            "file_size_bytes": image_stat.st_size,
+            "has_alpha": img.alpha_channel,
+            "type": img.type
+        }
+    return image_info
+
+# apply_filterで使用できるフィルターの種類
+FILTER_TYPES = ("sharpen", "edge", "emboss", "oil_paint", "charcoal", "sketch", "wave", "swirl", "implode", "solarize", "spread", "noise")
+
+def apply_image_filter(img, filter_type, strength_float):
+    """読み込み済みの画像にフィルターを適用する（filter_typeはFILTER_TYPESのいずれか）"""
+    if filter_type.lower() == "sharpen":
+        # シャープネスフィルター
+        img.sharpen(radius=0.0, sigma=strength_float)
+    elif filter_type.lower() == "edge":
+        # エッジ検出フィルター
+        img.edge(radius=strength_float)
+    elif filter_type.lower() == "emboss":
+        # エンボスフィルター
+        img.emboss(radius=strength_float, sigma=1.0)
+    elif filter_type.lower() == "oil_paint":
+        # 油絵風フィルター
+        img.oil_paint(radius=strength_float)
+    elif filter_type.lower() == "charcoal":
+        # 木炭画風フィルター
+        img.charcoal(radius=strength_float, sigma=1.0)
+    elif filter_type.lower() == "sketch":
+        # スケッチ風フィルター
+        img.sketch(radius=strength_float, sigma=1.0, angle=45.0)
+    elif filter_type.lower() == "wave":
+        # 波形歪みフィルター
+        img.wave(amplitude=strength_float * 5.0, wave_length=strength_float * 20.0)
+    elif filter_type.lower() == "swirl":
+        # 渦巻きフィルター
+        img.swirl(degree=strength_float * 90.0)
+    elif filter_type.lower() == "implode":
+        # 内破フィルター
+        img.implode(amount=strength_float * 0.5)
+    elif filter_type.lower() == "solarize":
+        # ソラリゼーションフィルター
+        img.solarize(threshold=strength_float * 0.5)
+    elif filter_type.lower() == "spread":
+        # スプレッドフィルター
+        img.spread(radius=strength_float * 3.0)
+    elif filter_type.lower() == "noise":
+        # ノイズ追加フィルター
+        # Wandのノイズタイプを使用
+        from wand.image import NOISE_TYPES
+        noise_type = 'gaussian' if 'gaussian' in NOISE_TYPES else list(NOISE_TYPES.keys())[0]
+        img.noise(noise_type, attenuate=strength_float)
+
+def apply_filter_sync(image_path, image_stat, output_path, filter_type, strength_float, inline):
+    """画像にフィルターを適用する（ワーカースレッドで実行される）
+
+    inlineが指定された場合はファイルに保存せず、ImageContentを返す
+    """
+    # Process the image with ImageMagick using Wand
+    with open_image(image_path, image_stat) as img:
+        # フィルタータイプに応じて処理を実行
+        apply_image_filter(img, filter_type, strength_float)
+
+        if inline:
+            # ファイルには保存せず、出力ファイルと同じ形式でエンコードした結果を返す
+            return encode_inline_image(img, pathlib.PurePath(output_path).suffix)
+        # 処理した画像を保存
+        save_output(img, output_path)
+    return None
+
+# process_pipelineで使用できる操作の種類
+PIPELINE_OPERATIONS = ("grayscale", "threshold", "resize", "blur", "modulate", "filter")
+
+def parse_pipeline_step(step):
+    """process_pipelineの1つの操作を(画像を変更する関数, 引数)に変換する
+
+    引数が不正な場合はValueErrorを送出する
+    """
+    if not isinstance(step, dict):
+        raise ValueError("each operation must be an object")
+    op = step.get("op")
+    if op == "grayscale":
+        return apply_grayscale, ()
+    if op == "threshold":
+        return apply_threshold, (parse_threshold(step.get("value")),)
+    # 各操作のパラメータはresize_image・blur_image・modify_colorsと同じ関数で変換し、同じ既定値を使う
+    if op == "resize":
+        try:
+            scale_float, width_float, height_float = parse_resize_parameters(step.get("scale"), step.get("width"), step.get("height"))
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"invalid resize parameters - {e}")
+        if scale_float is None and width_float is None and height_float is None:
+            raise ValueError("resize needs width, height or scale")
+        return apply_resize, (scale_float, width_float, height_float)
+    if op == "blur":
+        return apply_blur, parse_blur_parameters(step.get("radius"), step.get("sigma"))
+    if op == "modulate":
+        hue_shift_float = parse_hue_shift(step.get("hue_shift"))
+        brightness_float = clamp_number(step.get("brightness"), 100.0, 0.0, 200.0, "brightness")
+        saturation_float = clamp_number(step.get("saturation"), 100.0, 0.0, 200.0, "saturation")
+        return apply_modulate, (hue_shift_float, brightness_float, saturation_float)
+    if op == "filter":
+        filter_type = step.get("filter_type")
+        if not isinstance(filter_type, str) or filter_type.lower() not in FILTER_TYPES:
+            raise ValueError(f"unknown filter type '{filter_type}'. Available filters: {', '.join(FILTER_TYPES)}")
+        return apply_image_filter, (filter_type, clamp_number(step.get("filter_strength"), 1.0, 0.0, 10.0, "filter_strength"))
+    raise ValueError(f"unknown operation '{op}'. Available operations: {', '.join(PIPELINE_OPERATIONS)}")
+
+def process_pipeline_sync(image_path, image_stat, output_path, steps, inline):
+    """画像を一度だけ読み込み、複数の操作を順に適用してから一度だけ保存する（ワーカースレッドで実行される）
+
+    inlineが指定された場合はファイルに保存せず、ImageContentを返す
+    """
+    # Process the image with ImageMagick using Wand
+    with open_image(image_path, image_stat) as img:
+        # 途中結果はエンコード・デコードせず、同じ画像に続けて適用する
+        for apply, args in steps:
+            apply(img, *args)
+        if inline:
+            # ファイルには保存せず、出力ファイルと同じ形式でエンコードした結果を返す
+            return encode_inline_image(img, pathlib.PurePath(output_path).suffix)
+        # 処理した画像を保存
+        save_output(img, output_path)
+    return None
+
+# Wandの処理の同時実行数の上限（起動時にmain()が--max-concurrencyから作成する）
+wand_limiter = None
+
+async def run_wand(func, *args):
+    """Wandの処理をワーカースレッドで実行する
+
+    ImageMagickの処理はCPUとメモリを多く使うため、同時に実行する数をwand_limiterで制限する
+    """
+    return await anyio.to_thread.run_sync(func, *args, limiter=wand_limiter)
+
+def normalize_arguments(arguments):
+    """ツールの引数を辞書に正規化する"""
+    if isinstance(arguments, dict):
+        return arguments
+    # JSON文字列で渡された場合のみデコードを試みる
+    if isinstance(arguments, str) and arguments.lstrip().startswith("{"):
+        try:
+            decoded = json.loads(arguments)
+        except ValueError:
+            return {}
+        if isinstance(decoded, dict):
+            return decoded
+    return {}
+
+def clamp_number(value, default, minimum, maximum, name, convert=float):
+    """引数を数値に変換し、minimum〜maximumの範囲に収める（変換できない場合はdefaultを返す）"""
+    try:
+        number = convert(value) if value is not None else default
+    except (TypeError, ValueError) as e:
+        log_to_file(f"Error converting {name} to {convert.__name__}: {e}")
+        return default
+    if number < minimum:
+        log_to_file(f"{name} value out of range, using minimum: {minimum}")
+        return minimum
+    if number > maximum:
+        log_to_file(f"{name} value out of range, using maximum: {maximum}")
+        return maximum
+    return number
+
+def parse_threshold(threshold):
+    """二値化のしきい値を0.0〜1.0の数値に変換する（不正な値はデフォルトの0.5にする）
+
+    2〜255の整数は8ビットの画素値として扱い、255で割った値にする
+    """
+    # 8ビットの整数値で指定された場合
+    if isinstance(threshold, int) and not isinstance(threshold, bool) and 1 < threshold <= 255:
+        return threshold / 255.0
+    # しきい値の型変換と範囲チェック
+    try:
+        threshold_float = float(threshold) if threshold is not None else 0.5
+        if threshold_float < 0.0 or threshold_float > 1.0:
+            threshold_float = 0.5
+            log_to_file(f"Threshold value out of range, using default: {threshold_float}")
+    except (TypeError, ValueError) as e:
+        log_to_file(f"Error converting threshold to float: {e}")
+        threshold_float = 0.5
+        log_to_file(f"Using default threshold due to conversion error: {threshold_float}")
+    return threshold_float
+
+def parse_binarize_method(method):
+    """二値化のしきい値の決め方を検証する（不正な値はデフォルトのthresholdにする）"""
+    if method is None:
+        return "threshold"
+    method_str = str(method).lower()
+    if method_str not in BINARIZE_METHODS:
+        log_to_file(f"Unknown binarize method: {method}, using default: threshold")
+        return "threshold"
+    return method_str
+
+def parse_resize_parameters(scale, width, height):
+    """リサイズのパラメータ(scale, width, height)を数値に変換する（resize_imageとprocess_pipelineで共用する）
+
+    scaleが指定されている場合はwidthとheightを無視する。0以下の値は、scaleは1.0、width・heightは未指定として扱う
+    数値に変換できない場合はTypeErrorまたはValueErrorを送出する
+    """
+    if scale is not None:
+        scale_float = float(scale)
+        if scale_float <= 0:
+            log_to_file(f"Scale value must be positive, using default: 1.0")
+            scale_float = 1.0
+        return scale_float, None, None
+
+    # widthとheightの処理
+    width_float = None
+    if width is not None:
+        width_float = float(width)
+        if width_float <= 0:
+            log_to_file(f"Width value must be positive, using original width")
+            width_float = None
+
+    height_float = None
+    if height is not None:
+        height_float = float(height)
+        if height_float <= 0:
+            log_to_file(f"Height value must be positive, using original height")
+            height_float = None
+    return None, width_float, height_float
+
+def parse_blur_parameters(radius, sigma):
+    """ぼかしの半径とシグマを数値に変換する（不正な値はデフォルトのradius=0.0、sigma=3.0にする）"""
+    try:
+        radius_float = float(radius) if radius is not None else 0.0
+        if radius_float < 0.0:
+            log_to_file(f"Radius value must be non-negative, using default: 0.0")
+            radius_float = 0.0
+
+        sigma_float = float(sigma) if sigma is not None else 3.0
+        if sigma_float < 0.0:
+            log_to_file(f"Sigma value must be non-negative, using default: 3.0")
+            sigma_float = 3.0
+    except (TypeError, ValueError) as e:
+        log_to_file(f"Error converting blur parameters to float: {e}")
+        radius_float = 0.0
+        sigma_float = 3.0
+        log_to_file(f"Using default blur parameters due to conversion error: radius={radius_float}, sigma={sigma_float}")
+    return radius_float, sigma_float
+
+def parse_hue_shift(hue_shift):
+    """色相の変更量（度）を-360〜360の数値に変換する（不正な値はデフォルトの0.0にする）"""
+    try:
+        hue_shift_float = float(hue_shift) if hue_shift is not None else 0.0
+        # 値を-360〜360の範囲に正規化（符号を保ったまま1回の剰余で求める）
+        return math.fmod(hue_shift_float, 360.0)
+    except (TypeError, ValueError) as e:
+        log_to_file(f"Error converting hue_shift to float: {e}")
+        return 0.0
+
+def split_image_path(image_path):
+    """出力ファイル名の作成に使う、入力ファイルの名前・拡張子・ディレクトリを返す"""
+    path = pathlib.Path(image_path)
+    return path.stem, path.suffix, path.parent
+
+def binarize_output_path(image_path):
+    """二値化結果の出力パス（[元のファイル名]_binarized.png）を返す"""
+    file_name, _, output_dir = split_image_path(image_path)
+    return str(output_dir / f"{file_name}_binarized{BINARIZE_OUTPUT_EXT}")
+
+# 二値化処理
+async def handle_binarize_image(image_path, image_stat, arguments):
+    """画像を二値化する"""
+    inline = bool(arguments.get("inline", False))
+    
+    # 二値化用パラメータの取得
+    threshold = 0.5  # デフォルト値
+    if "threshold" in arguments:
+        threshold = arguments.get("threshold")
+        logger.debug("DEBUG: Using threshold from arguments: %s", threshold)
+
+    log_to_file(f"After argument processing - image_path: {image_path}, threshold: {threshold}")
+
+    threshold_float = parse_threshold(threshold)
+    method = parse_binarize_method(arguments.get("method"))
+    logger.debug("DEBUG: Using method from arguments: %s", method)
+
+    output_path = binarize_output_path(image_path)
+
+    # 同じ入力・パラメータの処理結果が残っていれば再処理しない
+    cache_key = None
+    if not inline:
+        cache_key = result_cache_key("binarize_image", image_path, image_stat, method, threshold_float)
+        cached_path = get_cached_result(cache_key)
+        if cached_path:
+            log_to_file(f"Using cached binarized image: {cached_path}")
+            return [types.TextContent(type="text", text=f"Image binarized successfully. Output saved to: {cached_path}"), output_resource_link(cached_path)]
+
+    # Wandの処理はイベントループを止めないようワーカースレッドで実行する
+    # inlineの場合はImageContent、それ以外は出力ファイルのoutput_file_signatureの値が返る
+    result = await run_wand(
+        binarize_image_sync, image_path, image_stat, output_path, threshold_float, method, inline
+    )
+
+    if inline:
+        log_to_file(f"Image binarized successfully. Returned inline as {result.mimeType}")
+        return [types.TextContent(type="text", text="Image binarized successfully."), result]
+    store_cached_result(cache_key, output_path, result)
+    log_to_file(f"Image binarized successfully. Output saved to: {output_path}")
+    return [types.TextContent(type="text", text=f"Image binarized successfully. Output saved to: {output_path}"), output_resource_link(output_path)]
+
+# フォーマット変換処理
+async def handle_convert_image_format(image_path, image_stat, arguments):
+    """画像のフォーマットを変換する"""
+    file_name, _, output_dir = split_image_path(image_path)
+    inline = bool(arguments.get("inline", False))
+    
+    # フォーマット変換用パラメータの取得
+    output_format = None
+    quality = None
+
+    if "output_format" in arguments:
+        output_format = arguments.get("output_format")
+        logger.debug("DEBUG: Using output_format from arguments: %s", output_format)
+    if "quality" in arguments:
+        quality = arguments.get("quality")
+        logger.debug("DEBUG: Using quality from arguments: %s", quality)
+
+    log_to_file(f"After argument processing - image_path: {image_path}, output_format: {output_format}, quality: {quality}")
+
+    # パラメータの検証
+    if not output_format:
+        log_to_file(f"Error: No output format specified")
+        return [types.TextContent(type="text", text=f"Error: No output format specified")]
+
+    # 出力フォーマットの正規化（小文字に変換し、ドットを削除）
+    output_format = output_format.lower().strip('.')
+
+    # ImageMagickが対応していない形式は画像を読み込む前にエラーにする
+    if output_format not in get_supported_formats():
+        error_message = f"Error: Unsupported output format '{output_format}'"
+        log_to_file(error_message)
+        return [types.TextContent(type="text", text=error_message)]
+
+    # 品質パラメータの処理（JPEGなどの圧縮フォーマット用）
+    quality_int = clamp_number(quality, 85, 1, 100, "quality", convert=int)
+
+    # 出力ファイル名の作成
+    output_path = str(output_dir / f"{file_name}.{output_format}")
+
+    # Wandの処理はイベントループを止めないようワーカースレッドで実行する
+    image_content = await run_wand(convert_image_format_sync, image_path, image_stat, output_path, quality_int, inline)
+
+    if inline:
+        log_to_file(f"Image format converted successfully. Returned inline as {image_content.mimeType}")
+        return [types.TextContent(type="text", text="Image format converted successfully."), image_content]
+    log_to_file(f"Image format converted successfully. Output saved to: {output_path}")
+    return [types.TextContent(type="text", text=f"Image format converted successfully. Output saved to: {output_path}"), output_resource_link(output_path)]
+
+# リサイズ処理
+async def handle_resize_image(image_path, image_stat, arguments):
+    """画像をリサイズする"""
+    file_name, file_ext, output_dir = split_image_path(image_path)
+    inline = bool(arguments.get("inline", False))
+    
+    # リサイズ用パラメータの取得
+    width = None
+    height = None
+    scale = None
+
+    if "width" in arguments:
+        width = arguments.get("width")
+        logger.debug("DEBUG: Using width from arguments: %s", width)
+    if "height" in arguments:
+        height = arguments.get("height")
+        logger.debug("DEBUG: Using height from arguments: %s", height)
+    if "scale" in arguments:
+        scale = arguments.get("scale")
+        logger.debug("DEBUG: Using scale from arguments: %s", scale)
+
+    log_to_file(f"After argument processing - image_path: {image_path}, width: {width}, height: {height}, scale: {scale}")
+
+    # パラメータの型変換と検証
+    try:
+        scale_float, width_float, height_float = parse_resize_parameters(scale, width, height)
+        # widthもheightも指定されていない場合は、元のサイズを使用
+        if width_float is None and height_float is None and scale_float is None:
+            log_to_file(f"No resize parameters specified, using original size")
+            return [types.TextContent(type="text", text=f"Error: No resize parameters specified")]
+    except (TypeError, ValueError) as e:
+        log_to_file(f"Error converting resize parameters to float: {e}")
+        return [types.TextContent(type="text", text=f"Error: Invalid resize parameters - {str(e)}")]
+
+    output_path = str(output_dir / f"{file_name}_resized{file_ext}")
+
+    # Wandの処理はイベントループを止めないようワーカースレッドで実行する
+    image_content = await run_wand(resize_image_sync, image_path, output_path, scale_float, width_float, height_float, inline)
+
+    if inline:
+        log_to_file(f"Image resized successfully. Returned inline as {image_content.mimeType}")
+        return [types.TextContent(type="text", text="Image resized successfully."), image_content]
+    log_to_file(f"Image resized successfully. Output saved to: {output_path}")
+    return [types.TextContent(type="text", text=f"Image resized successfully. Output saved to: {output_path}"), output_resource_link(output_path)]
+
+# ぼかし処理
+async def handle_blur_image(image_path, image_stat, arguments):
+    """画像をぼかす"""
+    file_name, file_ext, output_dir = split_image_path(image_path)
+    inline = bool(arguments.get("inline", False))
+    
+    # ぼかし用パラメータの取得
+    radius = None
+    sigma = None
+
+    if "radius" in arguments:
+        radius = arguments.get("radius")
+        logger.debug("DEBUG: Using radius from arguments: %s", radius)
+    if "sigma" in arguments:
+        sigma = arguments.get("sigma")
+        logger.debug("DEBUG: Using sigma from arguments: %s", sigma)
+
+    log_to_file(f"After argument processing - image_path: {image_path}, radius: {radius}, sigma: {sigma}")
+
+    # パラメータの型変換と検証
+    radius_float, sigma_float = parse_blur_parameters(radius, sigma)
+
+    output_path = str(output_dir / f"{file_name}_blurred{file_ext}")
+
+    # sigmaが0のぼかしは画像を変化させないため、元のファイルをそのままコピーする（形式が拡張子と一致する場合のみ）
+    copied = False
+    if not inline and sigma_float == 0.0:
+        log_to_file("Sigma is 0, copying the original file if its format matches the extension")
+        copied = await run_wand(copy_if_format_matches, image_path, output_path)
+    if not copied:
+        # Wandの処理はイベントループを止めないようワーカースレッドで実行する
+        image_content = await run_wand(blur_image_sync, image_path, image_stat, output_path, radius_float, sigma_float, inline)
+        if inline:
+            log_to_file(f"Image blurred successfully. Returned inline as {image_content.mimeType}")
+            return [types.TextContent(type="text", text="Image blurred successfully."), image_content]
+
+    log_to_file(f"Image blurred successfully. Output saved to: {output_path}")
+    return [types.TextContent(type="text", text=f"Image blurred successfully. Output saved to: {output_path}"), output_resource_link(output_path)]
+
+# グレースケール変換処理
+async def handle_grayscale_image(image_path, image_stat, arguments):
+    """画像をグレースケールに変換する"""
+    file_name, file_ext, output_dir = split_image_path(image_path)
+    inline = bool(arguments.get("inline", False))
+    
+    output_path = str(output_dir / f"{file_name}_grayscale{file_ext}")
+
+    # Wandの処理はイベントループを止めないようワーカースレッドで実行する
+    image_content = await run_wand(grayscale_image_sync, image_path, image_stat, output_path, inline)
+
+    if inline:
+        log_to_file(f"Image converted to grayscale successfully. Returned inline as {image_content.mimeType}")
+        return [types.TextContent(type="text", text="Image converted to grayscale successfully."), image_content]
+    log_to_file(f"Image converted to grayscale successfully. Output saved to: {output_path}")
+    return [types.TextContent(type="text", text=f"Image converted to grayscale successfully. Output saved to: {output_path}"), output_resource_link(output_path)]
+
+# ファイルサイズの表示単位（大きい順）
+FILE_SIZE_UNITS = (("GB", 1 << 30), ("MB", 1 << 20), ("KB", 1 << 10))
+
+# 画像情報取得処理
+async def handle_get_image_info(image_path, image_stat, arguments):
+    """画像の情報を取得する"""
+    # Wandの処理はイベントループを止めないようワーカースレッドで実行する
+    image_info = await run_wand(get_image_info_sync, image_path, image_stat)
+
+    # ファイルサイズを人間が読める形式に変換
+    file_size = image_info["file_size_bytes"]
+    for unit, factor in FILE_SIZE_UNITS:
+        if file_size >= factor:
+            size_str = f"{file_size / factor:.1f} {unit}"
+            break
+    else:
+        size_str = f"{file_size} bytes"
+
+    # 結果を整理して表示
+    result_text = f"""Image Information:
+Filename: {image_info['filename']}
+Path: {image_info['full_path']}
+Format: {image_info['format']}
+Dimensions: {image_info['width']} x {image_info['height']} pixels
+Color Depth: {image_info['depth']} bits
+Colorspace: {image_info['colorspace']}
+Compression: {image_info['compression']}
+File Size: {size_str}
+Has Alpha Channel: {image_info['has_alpha']}
+Image Type: {image_info['type']}"""
+
+    if image_info['resolution']['x'] and image_info['resolution']['y']:
+        result_text += f"\nResolution: {image_info['resolution']['x']:.1f} x {image_info['resolution']['y']:.1f} DPI"
+
+    log_to_file(f"Image information retrieved successfully for: {image_path}")
+    return [types.TextContent(type="text", text=result_text)]
+
+# フィルター適用処理
+async def handle_apply_filter(image_path, image_stat, arguments):
+    """画像にフィルターを適用する"""
+    file_name, file_ext, output_dir = split_image_path(image_path)
+    inline = bool(arguments.get("inline", False))
+    
+    # フィルター用パラメータの取得
+    filter_type = None
+    filter_strength = 1.0  # デフォルト値
+
+    if "filter_type" in arguments:
+        filter_type = arguments.get("filter_type")
+        logger.debug("DEBUG: Using filter_type from arguments: %s", filter_type)
+    if "filter_strength" in arguments:
+        filter_strength = arguments.get("filter_strength")
+        logger.debug("DEBUG: Using filter_strength from arguments: %s", filter_strength)
+
+    log_to_file(f"After argument processing - image_path: {image_path}, filter_type: {filter_type}, filter_strength: {filter_strength}")
+
+    # パラメータの検証
+    if not filter_type:
+        log_to_file(f"Error: No filter type specified")
+        return [types.TextContent(type="text", text=f"Error: No filter type specified")]
+
+    # フィルター強度の処理
+    strength_float = clamp_number(filter_strength, 1.0, 0.0, 10.0, "filter_strength")
+
+    # フィルタータイプの検証（画像を読み込む前に行う）
+    if filter_type.lower() not in FILTER_TYPES:
+        error_message = f"Error: Unknown filter type '{filter_type}'. Available filters: {', '.join(FILTER_TYPES)}"
+        log_to_file(error_message)
+        return [types.TextContent(type="text", text=error_message)]
+
+    # 出力ファイル名の作成
+    output_path = str(output_dir / f"{file_name}_{filter_type}_filtered{file_ext}")
+
+    # Wandの処理はイベントループを止めないようワーカースレッドで実行する
+    image_content = await run_wand(apply_filter_sync, image_path, image_stat, output_path, filter_type, strength_float, inline)
+
+    if inline:
+        log_to_file(f"Filter '{filter_type}' applied successfully. Returned inline as {image_content.mimeType}")
+        return [types.TextContent(type="text", text=f"Filter '{filter_type}' applied successfully."), image_content]
+    log_to_file(f"Filter '{filter_type}' applied successfully. Output saved to: {output_path}")
+    return [types.TextContent(type="text", text=f"Filter '{filter_type}' applied successfully. Output saved to: {output_path}"), output_resource_link(output_path)]
+
+# 色調変更処理
+async def handle_modify_colors(image_path, image_stat, arguments):
+    """画像の色相・輝度・彩度を変更する"""
+    file_name, file_ext, output_dir = split_image_path(image_path)
+    inline = bool(arguments.get("inline", False))
+    
+    # 色調変更用パラメータの取得
+    hue_shift = 0.0  # デフォルト値
+    brightness = 100.0  # デフォルト値
+    saturation = 100.0  # デフォルト値
+
+    if "hue_shift" in arguments:
+        hue_shift = arguments.get("hue_shift")
+        logger.debug("DEBUG: Using hue_shift from arguments: %s", hue_shift)
+    if "brightness" in arguments:
+        brightness = arguments.get("brightness")
+        logger.debug("DEBUG: Using brightness from arguments: %s", brightness)
+    if "saturation" in arguments:
+        saturation = arguments.get("saturation")
+        logger.debug("DEBUG: Using saturation from arguments: %s", saturation)
+
+    log_to_file(f"After argument processing - image_path: {image_path}, hue_shift: {hue_shift}, brightness: {brightness}, saturation: {saturation}")
+
+    # パラメータの型変換と範囲チェック
+    # 色相変更量の処理
+    hue_shift_float = parse_hue_shift(hue_shift)
+
+    # 輝度・彩度の処理
+    brightness_float = clamp_number(brightness, 100.0, 0.0, 200.0, "brightness")
+    saturation_float = clamp_number(saturation, 100.0, 0.0, 200.0, "saturation")
+
+    log_to_file(f"Using normalized values - hue_shift: {hue_shift_float}, brightness: {brightness_float}, saturation: {saturation_float}")
+
+    output_path = str(output_dir / f"{file_name}_color_modified{file_ext}")
+
+    # 同じ入力・パラメータの処理結果が残っていれば再処理しない
+    cache_key = None
+    if not inline:
+        cache_key = result_cache_key("modify_colors", image_path, image_stat, hue_shift_float, brightness_float, saturation_float)
+        cached_path = get_cached_result(cache_key)
+        if cached_path:
+            log_to_file(f"Using cached color modified image: {cached_path}")
+            return [types.TextContent(type="text", text=f"Image colors modified successfully. Output saved to: {cached_path}"), output_resource_link(cached_path)]
+
+    # 色調を変更しない場合はデコード・再エンコードを行わず、元のファイルをそのままコピーする（形式が拡張子と一致する場合のみ）
+    # inlineの場合はImageContent、それ以外は出力ファイルのoutput_file_signatureの値が入る
+    result = None
+    if not inline and hue_shift_float == 0.0 and brightness_float == 100.0 and saturation_float == 100.0:
+        log_to_file("Color parameters are identity, copying the original file if its format matches the extension")
+        result = await run_wand(copy_if_format_matches, image_path, output_path)
+    if result is None:
+        # Wandの処理はイベントループを止めないようワーカースレッドで実行する
+        result = await run_wand(
+            modify_colors_sync, image_path, image_stat, output_path, file_ext,
+            hue_shift_float, brightness_float, saturation_float, inline
+        )
+
+    if inline:
+        log_to_file(f"Image colors modified successfully. Returned inline as {result.mimeType}")
+        return [types.TextContent(type="text", text="Image colors modified successfully."), result]
+    store_cached_result(cache_key, output_path, result)
+    log_to_file(f"Image colors modified successfully. Output saved to: {output_path}")
+    return [types.TextContent(type="text", text=f"Image colors modified successfully. Output saved to: {output_path}"), output_resource_link(output_path)]
+
+# 複数操作の連続適用処理
+async def handle_process_pipeline(image_path, image_stat, arguments):
+    """画像に複数の操作を順に適用する"""
+    file_name, file_ext, output_dir = split_image_path(image_path)
+    inline = bool(arguments.get("inline", False))
+
+    operations = arguments.get("operations")
+    logger.debug("DEBUG: Using operations from arguments: %s", operations)
+
+    # パラメータの検証（画像を読み込む前にすべての操作を確認する）
+    if not isinstance(operations, list) or not operations:
+        log_to_file("Error: No operations provided")
+        return [types.TextContent(type="text", text="Error: No operations provided")]
+    steps = []
+    for index, step in enumerate(operations):
+        try:
+            steps.append(parse_pipeline_step(step))
+        except (TypeError, ValueError) as e:
+            error_message = f"Error: Invalid operation {index + 1}: {str(e)}"
+            log_to_file(error_message)
+            return [types.TextContent(type="text", text=error_message)]
+
+    op_names = ", ".join(step["op"] for step in operations)
+    log_to_file(f"After argument processing - image_path: {image_path}, operations: {op_names}")
+
+    output_path = str(output_dir / f"{file_name}_pipeline{file_ext}")
+
+    # Wandの処理はイベントループを止めないようワーカースレッドで実行する
+    image_content = await run_wand(process_pipeline_sync, image_path, image_stat, output_path, steps, inline)
+
+    if inline:
+        log_to_file(f"Pipeline ({op_names}) applied successfully. Returned inline as {image_content.mimeType}")
+        return [types.TextContent(type="text", text=f"Pipeline ({op_names}) applied successfully."), image_content]
+    log_to_file(f"Pipeline ({op_names}) applied successfully. Output saved to: {output_path}")
+    return [types.TextContent(type="text", text=f"Pipeline ({op_names}) applied successfully. Output saved to: {output_path}"), output_resource_link(output_path)]
+
+# 一括二値化処理
+async def handle_binarize_batch(arguments):
+    """複数の画像をまとめて二値化する"""
+    image_paths = arguments.get("image_paths")
+    threshold = arguments.get("threshold", 0.5)
+    logger.debug("DEBUG: Using image_paths from arguments: %s", image_paths)
+    logger.debug("DEBUG: Using threshold from arguments: %s", threshold)
+
+    # パラメータの検証
+    if not isinstance(image_paths, list) or not image_paths:
+        log_to_file("Error: No image paths provided")
+        return [types.TextContent(type="text", text="Error: No image paths provided")]
+
+    # 同じ出力ファイルへの同時書き込みにならないよう、出力パスごとに書き込む入力を1つに決める
+    # 同じファイルが複数回指定された場合は1回だけ処理し、別のファイル（a.jpgとa.pngなど）が
+    # 同じ出力パスになる場合は、後に指定されたものをエラーにする
+    unique_paths = []
+    output_owners = {}
+    for image_path in image_paths:
+        if isinstance(image_path, str) and image_path:
+            output_key = os.path.abspath(binarize_output_path(image_path))
+            owner = output_owners.setdefault(output_key, image_path)
+            if owner is not image_path and os.path.abspath(owner) == os.path.abspath(image_path):
+                log_to_file(f"Skipping duplicate image path: {image_path}")
+                continue
+        unique_paths.append(image_path)
+    image_paths = unique_paths
+
+    threshold_float = parse_threshold(threshold)
+    method = parse_binarize_method(arguments.get("method"))
+    log_to_file(f"After argument processing - {len(image_paths)} images, threshold: {threshold_float}, method: {method}")
+
+    # 各画像の結果（出力パスまたはエラーメッセージ）を入力と同じ順序で保持する
+    results = [None] * len(image_paths)
+
+    async def binarize_one(index, image_path):
+        # 1枚の不正なパスでタスクグループ全体（他の画像の処理）を止めないよう、エラーはその画像の結果にする
+        if not isinstance(image_path, str) or not image_path:
+            log_to_file(f"Error: Invalid image path: {image_path!r}")
+            results[index] = (False, f"Error: Invalid image path: {image_path!r}")
+            return
+        try:
+            image_stat = os.stat(image_path)
+        except FileNotFoundError:
+            log_to_file(f"Error: Image file not found at {image_path}")
+            results[index] = (False, f"Error: Image file not found at {image_path}")
+            return
+        except (OSError, TypeError, ValueError) as e:
+            log_to_file(f"Error: Cannot access image file {image_path}: {e}")
+            results[index] = (False, f"Error: Cannot access image file {image_path}: {str(e)}")
+            return
+        output_path = binarize_output_path(image_path)
+        owner = output_owners[os.path.abspath(output_path)]
+        if owner is not image_path:
+            log_to_file(f"Error: Output {output_path} of {image_path} is already written for {owner}")
+            results[index] = (False, f"Error: {image_path}: output {output_path} is already written for {owner}")
+            return
+
+        # 同じ入力・パラメータの処理結果が残っていれば再処理しない
+        cache_key = result_cache_key("binarize_image", image_path, image_stat, method, threshold_float)
+        cached_path = get_cached_result(cache_key)
+        if cached_path:
+            log_to_file(f"Using cached binarized image: {cached_path}")
+            results[index] = (True, cached_path)
+            return
+
+        try:
+            output_signature = await run_wand(binarize_image_sync, image_path, image_stat, output_path, threshold_float, method, False)
+            store_cached_result(cache_key, output_path, output_signature)
+        except Exception as e:
+            # 1枚の失敗で他の画像の処理を止めない
+            log_to_file(f"Error binarizing {image_path}: {traceback.format_exc()}")
+            results[index] = (False, f"Error: {image_path}: {str(e)}")
+            return
+        results[index] = (True, output_path)
+
+    async with anyio.create_task_group() as tg:
+        for index, image_path in enumerate(image_paths):
+            tg.start_soon(binarize_one, index, image_path)
+
+    succeeded = [text for ok, text in results if ok]
+    lines = [f"Binarized {len(succeeded)} of {len(image_paths)} images."]
+    for image_path, (ok, text) in zip(image_paths, results):
+        lines.append(f"- {image_path} -> {text}" if ok else f"- {text}")
+    log_to_file(f"Batch binarization finished: {len(succeeded)} of {len(image_paths)} images succeeded")
+    return [types.TextContent(type="text", text="\n".join(lines))] + [output_resource_link(path) for path in succeeded]
+
+async def call_image_tool(handler, arguments):
+    """image_pathを検証してから1枚の画像を処理するツールの処理関数を呼び出す"""
+    image_path = arguments.get("image_path")
+    logger.debug("DEBUG: Using image_path from arguments: %s", image_path)
+
+    # Validate inputs
+    if not image_path:
+        log_to_file("Error: No image path provided")
+        return [types.TextContent(type="text", text="Error: No image path provided")]
+
+    # 存在確認とキャッシュキー用の更新時刻の取得を1回のstatで行う
+    log_to_file(f"Checking if file exists: {image_path}")
+    try:
+        image_stat = os.stat(image_path)
+    except FileNotFoundError:
+        log_to_file(f"Error: Image file not found at {image_path}")
+        return [types.TextContent(type="text", text=f"Error: Image file not found at {image_path}")]
+
+    return await handler(image_path, image_stat, arguments)
+
+# 複数操作の一括処理
+async def handle_batch_process(arguments):
+    """複数のツール呼び出しをまとめて処理する"""
+    operations = arguments.get("operations")
+    logger.debug("DEBUG: Using operations from arguments: %s", operations)
+
+    # パラメータの検証
+    if not isinstance(operations, list) or not operations:
+        log_to_file("Error: No operations provided")
+        return [types.TextContent(type="text", text="Error: No operations provided")]
+
+    log_to_file(f"After argument processing - {len(operations)} operations")
+
+    # 各操作の結果を入力と同じ順序で保持する
+    results = [None] * len(operations)
+
+    # 出力ファイル名はどのツールも入力ファイルと同じディレクトリの[元のファイル名]_*になるため、
+    # ディレクトリと元のファイル名が同じ操作は同じ出力ファイルに書き込む可能性がある。
+    # それらを1つのグループにまとめ、グループ内は指定された順に1つずつ処理する（グループ同士は並行に処理する）
+    groups = collections.OrderedDict()
+    for index, operation in enumerate(operations):
+        image_path = normalize_arguments(operation.get("arguments")).get("image_path") if isinstance(operation, dict) else None
+        if isinstance(image_path, str) and image_path:
+            file_name, _, output_dir = split_image_path(image_path)
+            group_key = (os.path.abspath(output_dir), file_name)
+        else:
+            group_key = index
+        groups.setdefault(group_key, []).append(index)
+
+    async def run_one(index, operation):
+        tool = operation.get("tool") if isinstance(operation, dict) else None
+        handler = TOOL_HANDLERS.get(tool)
+        if handler is None:
+            error_message = f"Error: Unknown tool name '{tool}'. Available tools are: {', '.join(sorted(TOOL_HANDLERS))}"
+            log_to_file(error_message)
+            results[index] = (tool, [types.TextContent(type="text", text=error_message)])
+            return
+        try:
+            results[index] = (tool, await call_image_tool(handler, normalize_arguments(operation.get("arguments"))))
+        except Exception as e:
+            # 1つの失敗で他の操作の処理を止めない
+            log_to_file(f"Error in batch operation {index + 1} ({tool}): {traceback.format_exc()}")
+            results[index] = (tool, [types.TextContent(type="text", text=f"Error: {str(e)}")])
+
+    async def run_group(indices):
+        for index in indices:
+            await run_one(index, operations[index])
+
+    # 各操作はWandの処理をrun_wandで実行するため、同時実行数はwand_limiterで制限される
+    async with anyio.create_task_group() as tg:
+        for indices in groups.values():
+            tg.start_soon(run_group, indices)
+
+    # 各操作の結果の先頭のテキストに操作番号とツール名を付けてまとめる
+    failed = sum(1 for _, contents in results if contents[0].text.startswith("Error"))
+    content = [types.TextContent(type="text", text=f"Processed {len(operations)} operations ({len(operations) - failed} succeeded, {failed} failed).")]
+    for index, (tool, contents) in enumerate(results):
+        content.append(types.TextContent(type="text", text=f"[{index + 1}] {tool}: {contents[0].text}"))
+        content.extend(contents[1:])
+    log_to_file(f"Batch processing finished: {len(operations) - failed} of {len(operations)} operations succeeded")
+    return content
+
+# ツール名と処理関数の対応表
+TOOL_HANDLERS = {
+    "binarize_image": handle_binarize_image,
+    "convert_image_format": handle_convert_image_format,
+    "resize_image": handle_resize_image,
+    "blur_image": handle_blur_image,
+    "grayscale_image": handle_grayscale_image,
+    "get_image_info": handle_get_image_info,
+    "apply_filter": handle_apply_filter,
+    "modify_colors": handle_modify_colors,
+    "process_pipeline": handle_process_pipeline,
+}
+
+# 複数の画像を受け取るツール（image_pathの共通検証を行わず、引数をそのまま渡す）
+BATCH_TOOL_HANDLERS = {
+    "binarize_batch": handle_binarize_batch,
+    "batch_process": handle_batch_process,
+}
+
+# list_toolsで返すツール定義（呼び出しのたびに作り直さないよう一度だけ作成する）
+TOOLS = [
+    types.Tool(
+        name="batch_process",
+        description="Run several image processing tool calls in one request using ImageMagick",
+        inputSchema={
+            "type": "object",
+            "required": ["operations"],
+            "properties": {
+                "operations": {
+                    "type": "array",
+                    "description": "Tool calls to run. Each operation gives the tool name and its arguments, as for a single call",
+                    "items": {
+                        "type": "object",
+                        "required": ["tool", "arguments"],
+                        "properties": {
+                            "tool": {
+                                "type": "string",
+                                "enum": sorted(TOOL_HANDLERS),
+                                "description": "Name of the tool to run"
+                            },
+                            "arguments": {
+                                "type": "object",
+                                "description": "Arguments for the tool, including image_path"
+                            }
+                        }
+                    }
+                }
+            }
+        }
+    ),
+    types.Tool(
+        name="apply_filter",
+        description="Apply various image filters using ImageMagick",
+        inputSchema={
+            "type": "object",
+            "required": ["image_path", "filter_type"],
+            "properties": {
+                "image_path": {
+                    "type": "string",
+                    "description": "Path to the image file to apply filter to"
+                },
+                "filter_type": {
+                    "type": "string",
+                    "description": "Type of filter to apply (sharpen, edge, emboss, oil_paint, charcoal, sketch, wave, swirl, implode, solarize, spread, noise)"
+                },
+                "filter_strength": {
+                    "type": "number",
+                    "description": "Strength of the filter effect (0.0 to 10.0)",
+                    "default": 1.0
+                },
+                "inline": {
+                    "type": "boolean",
+                    "description": "Return the processed image inline instead of saving it to a file",
+                    "default": False
+                }
+            }
+        }
+    ),
+    types.Tool(
+        name="binarize_batch",
+        description="Binarize multiple images in one call using ImageMagick",
+        inputSchema={
+            "type": "object",
+            "required": ["image_paths"],
+            "properties": {
+                "image_paths": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "Paths to the image files to binarize"
+                },
+                "threshold": {
+                    "type": "number",
+                    "description": "Threshold value for binarization (0.0 to 1.0, or an 8-bit integer 2 to 255), applied to every image",
+                    "default": 0.5
+                },
+                "method": {
+                    "type": "string",
+                    "enum": list(BINARIZE_METHODS),
+                    "description": "How to choose the threshold: 'threshold' uses the threshold value, 'otsu' computes it per image from the histogram with Otsu's method (requires ImageMagick 7.0.8-41 or later)",
+                    "default": "threshold"
+                }
+            }
+        }
+    ),
+    types.Tool(
+        name="binarize_image",
+        description="Binarize an image using ImageMagick",
+        inputSchema={
+            "type": "object",
+            "required": ["image_path"],
+            "properties": {
+                "image_path": {
+                    "type": "string",
+                    "description": "Path to the image file to binarize"
+                },
+                "threshold": {
+                    "type": "number",
+                    "description": "Threshold value for binarization (0.0 to 1.0, or an 8-bit integer 2 to 255)",
+                    "default": 0.5
+                },
+                "method": {
+                    "type": "string",
+                    "enum": list(BINARIZE_METHODS),
+                    "description": "How to choose the threshold: 'threshold' uses the threshold value, 'otsu' computes it from the image histogram with Otsu's method (requires ImageMagick 7.0.8-41 or later)",
+                    "default": "threshold"
+                },
+                "inline": {
+                    "type": "boolean",
+                    "description": "Return the processed image inline instead of saving it to a file",
+                    "default": False
+                }
+            }
+        }
+    ),
+    types.Tool(
+        name="blur_image",
+        description="Blur an image using ImageMagick",
+        inputSchema={
+            "type": "object",
+            "required": ["image_path"],
+            "properties": {
+                "image_path": {
+                    "type": "string",
+                    "description": "Path to the image file to blur"
+                },
+                "radius": {
+                    "type": "number",
+                    "description": "Blur radius (0.0 or higher, 0.0 means auto-select)",
+                    "default": 0.0
+                },
+                "sigma": {
+                    "type": "number",
+                    "description": "Blur sigma - controls the blur strength (higher values create stronger blur)",
+                    "default": 3.0
+                },
+                "inline": {
+                    "type": "boolean",
+                    "description": "Return the processed image inline instead of saving it to a file",
+                    "default": False
+                }
+            }
+        }
+    ),
+    types.Tool(
+        name="convert_image_format",
+        description="Convert an image from one format to another (e.g., PNG to JPG, BMP to TGA)",
+        inputSchema={
+            "type": "object",
+            "required": ["image_path", "output_format"],
+            "properties": {
+                "image_path": {
+                    "type": "string",
+                    "description": "Path to the image file to convert"
+                },
+                "output_format": {
+                    "type": "string",
+                    "description": "Output format (e.g., jpg, png, tiff, bmp, tga, webp, etc.)"
+                },
+                "quality": {
+                    "type": "number",
+                    "description": "Quality for lossy formats like JPG (1-100, higher is better quality)",
+                    "default": 85
+                },
+                "inline": {
+                    "type": "boolean",
+                    "description": "Return the processed image inline instead of saving it to a file",
+                    "default": False
+                }
+            }
+        }
+    ),
+    types.Tool(
+        name="modify_colors",
+        description="Modify the colors (hue, brightness, saturation) of an image using ImageMagick",
+        inputSchema={
+            "type": "object",
+            "required": ["image_path"],
+            "properties": {
+                "image_path": {
+                    "type": "string",
+                    "description": "Path to the image file to modify"
+                },
+                "hue_shift": {
+                    "type": "number",
+                    "description": "Hue shift value in degrees (-360.0 to 360.0)",
+                    "default": 0.0
+                },
+                "brightness": {
+                    "type": "number",
+                    "description": "Brightness adjustment (0.0 to 200.0, 100.0 is original)",
+                    "default": 100.0
+                },
+                "saturation": {
+                    "type": "number",
+                    "description": "Saturation adjustment (0.0 to 200.0, 100.0 is original)",
+                    "default": 100.0
+                },
+                "inline": {
+                    "type": "boolean",
+                    "description": "Return the processed image inline instead of saving it to a file",
+                    "default": False
+                }
+            }
+        }
+    ),
+    types.Tool(
+        name="process_pipeline",
+        description="Apply several operations to one image in sequence, decoding and saving it only once, using ImageMagick",
+        inputSchema={
+            "type": "object",
+            "required": ["image_path", "operations"],
+            "properties": {
+                "image_path": {
+                    "type": "string",
+                    "description": "Path to the image file to process"
+                },
+                "operations": {
+                    "type": "array",
+                    "description": "Operations to apply in order. Each has an 'op' (grayscale, threshold, resize, blur, modulate, filter) and that operation's parameters: threshold takes value; resize takes width, height or scale; blur takes radius and sigma; modulate takes hue_shift, brightness and saturation; filter takes filter_type and filter_strength",
+                    "items": {
+                        "type": "object",
+                        "required": ["op"],
+                        "properties": {
+                            "op": {
+                                "type": "string",
+                                "enum": list(PIPELINE_OPERATIONS)
+                            }
+                        }
+                    }
+                },
+                "inline": {
+                    "type": "boolean",
+                    "description": "Return the processed image inline instead of saving it to a file",
+                    "default": False
+                }
+            }
+        }
+    ),
+    types.Tool(
+        name="resize_image",
+        description="Resize an image using ImageMagick",
+        inputSchema={
+            "type": "object",
+            "required": ["image_path"],
+            "properties": {
+                "image_path": {
+                    "type": "string",
+                    "description": "Path to the image file to resize"
+                },
+                "width": {
+                    "type": "number",
+                    "description": "New width in pixels. If only width is specified, height will be calculated to maintain aspect ratio.",
+                    "default": None
+                },
+                "height": {
+                    "type": "number",
+                    "description": "New height in pixels. If only height is specified, width will be calculated to maintain aspect ratio.",
+                    "default": None
+                },
+                "scale": {
+                    "type": "number",
+                    "description": "Scale factor (e.g., 0.5 for half size, 2.0 for double size). If specified, width and height are ignored.",
+                    "default": None
+                },
+                "inline": {
+                    "type": "boolean",
+                    "description": "Return the processed image inline instead of saving it to a file",
+                    "default": False
+                }
+            }
+        }
+    ),
+    types.Tool(
+        name="grayscale_image",
+        description="Convert an image to grayscale using ImageMagick",
+        inputSchema={
+            "type": "object",
+            "required": ["image_path"],
+            "properties": {
+                "image_path": {
+                    "type": "string",
+                    "description": "Path to the image file to convert to grayscale"
+                },
+                "inline": {
+                    "type": "boolean",
+                    "description": "Return the processed image inline instead of saving it to a file",
+                    "default": False
+                }
+            }
+        }
+    ),
+    types.Tool(
+        name="get_image_info",
+        description="Get detailed information about an image using ImageMagick",
+        inputSchema={
+            "type": "object",
+            "required": ["image_path"],
+            "properties": {
+                "image_path": {
+                    "type": "string",
+                    "description": "Path to the image file to analyze"
+                }
+            }
+        }
+    )
+]
 
 @click.command()
 @click.option("--transport", default="stdio", type=click.Choice(["stdio"]), help="Transport type (only stdio supported)")
-def main(transport: str) -> int:
+@click.option("--max-concurrency", default=None, type=click.IntRange(min=1), help="Maximum number of ImageMagick operations run at the same time (default: number of CPU cores)")
+@click.option("--decoded-cache-mb", default=None, type=click.IntRange(min=0), help="Maximum memory in MB kept for decoded images reused between tool calls; 0 disables the cache (default: 256)")
+@click.option("--log-level", default=None, type=click.Choice(["DEBUG", "INFO"], case_sensitive=False), help="Log level for the log file (default: INFO, or DEBUG when IMAGEMAGICK_MCP_DEBUG=1)")
+def main(transport: str, max_concurrency: int, decoded_cache_mb: int, log_level: str) -> int:
     """Run the ImageMagick MCP server."""
+    if log_level:
+        logger.setLevel(log_level.upper())
+    if decoded_cache_mb is not None:
+        global decoded_cache_max_bytes
+        decoded_cache_max_bytes = decoded_cache_mb * 1024 * 1024
     app = Server("ImageMagick MCP Server")
 
     @app.call_tool()
     async def process_image(
         name: str = None,
         arguments: dict = None
-    ) -> list[types.TextContent | types.ImageContent | types.EmbeddedResource]:
+    ) -> list[types.TextContent | types.ImageContent | types.ResourceLink | types.EmbeddedResource]:
         """Process an image using ImageMagick.
         
         Args:
@@ -40,530 +1662,24 @@ def main(transport: str) -> int:
         """
         try:
             log_to_file(f"FUNCTION CALLED: process_image")
-            log_to_file(f"Raw input - name: {repr(name)}, arguments: {repr(arguments)}")
-            log_to_file(f"DEBUG: Received arguments: {locals()}")
-            
-            # nameパラメータに基づいて処理を分岐
-            is_binarize = False
-            is_resize = False
-            is_convert_format = False
-            is_blur = False
-            is_grayscale = False
-            is_get_info = False
-            is_apply_filter = False
-            if name == 'binarize_image':
-                log_to_file(f"Detected binarize_image call, will perform binarization")
-                is_binarize = True
-            elif name == 'resize_image':
-                log_to_file(f"Detected resize_image call, will perform resizing")
-                is_resize = True
-            elif name == 'convert_image_format':
-                log_to_file(f"Detected convert_image_format call, will perform format conversion")
-                is_convert_format = True
-            elif name == 'blur_image':
-                log_to_file(f"Detected blur_image call, will perform blurring")
-                is_blur = True
-            elif name == 'grayscale_image':
-                log_to_file(f"Detected grayscale_image call, will perform grayscale conversion")
-                is_grayscale = True
-            elif name == 'get_image_info':
-                log_to_file(f"Detected get_image_info call, will get image information")
-                is_get_info = True
-            elif name == 'apply_filter':
-                log_to_file(f"Detected apply_filter call, will apply image filter")
-                is_apply_filter = True
-            
-            # 共通の引数処理
-            image_path = None
-            if arguments and isinstance(arguments, dict):
-                log_to_file(f"DEBUG: Processing arguments dictionary: {arguments}")
-                if "image_path" in arguments:
-                    image_path = arguments.get("image_path")
-                    log_to_file(f"DEBUG: Using image_path from arguments: {image_path}")
-            
-            # Validate inputs
-            if not image_path:
-                log_to_file("Error: No image path provided")
-                return [types.TextContent(type="text", text="Error: No image path provided")]
-            
-            log_to_file(f"Checking if file exists: {image_path}")
-            if not os.path.exists(image_path):
-                log_to_file(f"Error: Image file not found at {image_path}")
-                return [types.TextContent(type="text", text=f"Error: Image file not found at {image_path}")]
-            
-            # Create output filename
-            file_name, file_ext = os.path.splitext(os.path.basename(image_path))
-            output_dir = os.path.dirname(image_path)
-            
-            # 二値化処理
-            if is_binarize:
-                # 二値化用パラメータの取得
-                threshold = 0.5  # デフォルト値
-                if arguments and isinstance(arguments, dict) and "threshold" in arguments:
-                    threshold = arguments.get("threshold")
-                    log_to_file(f"DEBUG: Using threshold from arguments: {threshold}")
-                
-                log_to_file(f"After argument processing - image_path: {image_path}, threshold: {threshold}")
-                
-                # しきい値の型変換と範囲チェック
-                try:
-                    threshold_float = float(threshold) if threshold is not None else 0.5
-                    if threshold_float < 0.0 or threshold_float > 1.0:
-                        threshold_float = 0.5
-                        log_to_file(f"Threshold value out of range, using default: {threshold_float}")
-                except (TypeError, ValueError) as e:
-                    log_to_file(f"Error converting threshold to float: {e}")
-                    threshold_float = 0.5
-                    log_to_file(f"Using default threshold due to conversion error: {threshold_float}")
-                
-                output_path = os.path.join(output_dir, f"{file_name}_binarized{file_ext}")
-                
-                # Process the image with ImageMagick using Wand
-                with Image(filename=image_path) as img:
-                    # Convert to grayscale first
-                    img.type = 'grayscale'
-                    # Apply threshold to binarize
-                    img.threshold(threshold_float)
-                    # Save the processed image
-                    img.save(filename=output_path)
-                
-                log_to_file(f"Image binarized successfully. Output saved to: {output_path}")
-                return [types.TextContent(type="text", text=f"Image binarized successfully. Output saved to: {output_path}")]
-            
-            # フォーマット変換処理
-            elif is_convert_format:
-                # フォーマット変換用パラメータの取得
-                output_format = None
-                quality = None
-                
-                if arguments and isinstance(arguments, dict):
-                    if "output_format" in arguments:
-                        output_format = arguments.get("output_format")
-                        log_to_file(f"DEBUG: Using output_format from arguments: {output_format}")
-                    if "quality" in arguments:
-                        quality = arguments.get("quality")
-                        log_to_file(f"DEBUG: Using quality from arguments: {quality}")
-                
-                log_to_file(f"After argument processing - image_path: {image_path}, output_format: {output_format}, quality: {quality}")
-                
-                # パラメータの検証
-                if not output_format:
-                    log_to_file(f"Error: No output format specified")
-                    return [types.TextContent(type="text", text=f"Error: No output format specified")]
-                
-                # 出力フォーマットの正規化（小文字に変換し、ドットを削除）
-                output_format = output_format.lower().strip('.')
-                
-                # 品質パラメータの処理（JPEGなどの圧縮フォーマット用）
-                try:
-                    quality_int = int(quality) if quality is not None else 85
-                    if quality_int < 1:
-                        quality_int = 1
-                        log_to_file(f"Quality value out of range, using minimum: {quality_int}")
-                    elif quality_int > 100:
-                        quality_int = 100
-                        log_to_file(f"Quality value out of range, using maximum: {quality_int}")
-                except (TypeError, ValueError) as e:
-                    log_to_file(f"Error converting quality to integer: {e}")
-                    quality_int = 85
-                
-                # 出力ファイル名の作成
-                output_path = os.path.join(output_dir, f"{file_name}.{output_format}")
-                
-                # Process the image with ImageMagick using Wand
-                with Image(filename=image_path) as img:
-                    # 品質設定（JPEGなどの圧縮フォーマット用）
-                    img.compression_quality = quality_int
-                    
-                    # 画像を保存（フォーマットは拡張子から自動的に判断される）
-                    img.save(filename=output_path)
-                
-                log_to_file(f"Image format converted successfully. Output saved to: {output_path}")
-                return [types.TextContent(type="text", text=f"Image format converted successfully. Output saved to: {output_path}")]
-            
-            # リサイズ処理
-            elif is_resize:
-                # リサイズ用パラメータの取得
-                width = None
-                height = None
-                scale = None
-                
-                if arguments and isinstance(arguments, dict):
-                    if "width" in arguments:
-                        width = arguments.get("width")
-                        log_to_file(f"DEBUG: Using width from arguments: {width}")
-                    if "height" in arguments:
-                        height = arguments.get("height")
-                        log_to_file(f"DEBUG: Using height from arguments: {height}")
-                    if "scale" in arguments:
-                        scale = arguments.get("scale")
-                        log_to_file(f"DEBUG: Using scale from arguments: {scale}")
-                
-                log_to_file(f"After argument processing - image_path: {image_path}, width: {width}, height: {height}, scale: {scale}")
-                
-                # パラメータの型変換と検証
-                try:
-                    # scaleが指定されている場合は、widthとheightは無視する
-                    if scale is not None:
-                        scale_float = float(scale)
-                        if scale_float <= 0:
-                            log_to_file(f"Scale value must be positive, using default: 1.0")
-                            scale_float = 1.0
-                        width_float = None
-                        height_float = None
-                    else:
-                        scale_float = None
-                        # widthとheightの処理
-                        if width is not None:
-                            width_float = float(width)
-                            if width_float <= 0:
-                                log_to_file(f"Width value must be positive, using original width")
-                                width_float = None
-                        else:
-                            width_float = None
-                        
-                        if height is not None:
-                            height_float = float(height)
-                            if height_float <= 0:
-                                log_to_file(f"Height value must be positive, using original height")
-                                height_float = None
-                        else:
-                            height_float = None
-                        
-                        # widthもheightも指定されていない場合は、元のサイズを使用
-                        if width_float is None and height_float is None and scale_float is None:
-                            log_to_file(f"No resize parameters specified, using original size")
-                            return [types.TextContent(type="text", text=f"Error: No resize parameters specified")]
-                except (TypeError, ValueError) as e:
-                    log_to_file(f"Error converting resize parameters to float: {e}")
-                    return [types.TextContent(type="text", text=f"Error: Invalid resize parameters - {str(e)}")]
-                
-                output_path = os.path.join(output_dir, f"{file_name}_resized{file_ext}")
-                
-                # Process the image with ImageMagick using Wand
-                with Image(filename=image_path) as img:
-                    original_width = img.width
-                    original_height = img.height
-                    
-                    # リサイズ処理
-                    if scale_float is not None:
-                        # スケールに基づいてリサイズ
-                        new_width = int(original_width * scale_float)
-                        new_height = int(original_height * scale_float)
-                        log_to_file(f"Resizing image using scale factor {scale_float} to {new_width}x{new_height}")
-                        img.resize(new_width, new_height)
-                    else:
-                        # widthとheightに基づいてリサイズ
-                        if width_float is not None and height_float is not None:
-                            # 両方指定されている場合
-                            log_to_file(f"Resizing image to {width_float}x{height_float}")
-                            img.resize(int(width_float), int(height_float))
-                        elif width_float is not None:
-                            # widthのみ指定されている場合、アスペクト比を維持
-                            aspect_ratio = original_height / original_width
-                            new_height = int(width_float * aspect_ratio)
-                            log_to_file(f"Resizing image to width {width_float} (height {new_height} calculated to maintain aspect ratio)")
-                            img.resize(int(width_float), new_height)
-                        elif height_float is not None:
-                            # heightのみ指定されている場合、アスペクト比を維持
-                            aspect_ratio = original_width / original_height
-                            new_width = int(height_float * aspect_ratio)
-                            log_to_file(f"Resizing image to height {height_float} (width {new_width} calculated to maintain aspect ratio)")
-                            img.resize(new_width, int(height_float))
-                    
-                    # Save the processed image
-                    img.save(filename=output_path)
-                
-                log_to_file(f"Image resized successfully. Output saved to: {output_path}")
-                return [types.TextContent(type="text", text=f"Image resized successfully. Output saved to: {output_path}")]
-            
-            # ぼかし処理
-            elif is_blur:
-                # ぼかし用パラメータの取得
-                radius = None
-                sigma = None
-                
-                if arguments and isinstance(arguments, dict):
-                    if "radius" in arguments:
-                        radius = arguments.get("radius")
-                        log_to_file(f"DEBUG: Using radius from arguments: {radius}")
-                    if "sigma" in arguments:
-                        sigma = arguments.get("sigma")
-                        log_to_file(f"DEBUG: Using sigma from arguments: {sigma}")
-                
-                log_to_file(f"After argument processing - image_path: {image_path}, radius: {radius}, sigma: {sigma}")
-                
-                # パラメータの型変換と検証
-                try:
-                    radius_float = float(radius) if radius is not None else 0.0
-                    if radius_float < 0.0:
-                        log_to_file(f"Radius value must be non-negative, using default: 0.0")
-                        radius_float = 0.0
-                    
-                    sigma_float = float(sigma) if sigma is not None else 3.0
-                    if sigma_float < 0.0:
-                        log_to_file(f"Sigma value must be non-negative, using default: 3.0")
-                        sigma_float = 3.0
-                except (TypeError, ValueError) as e:
-                    log_to_file(f"Error converting blur parameters to float: {e}")
-                    radius_float = 0.0
-                    sigma_float = 3.0
-                    log_to_file(f"Using default blur parameters due to conversion error: radius={radius_float}, sigma={sigma_float}")
-                
-                output_path = os.path.join(output_dir, f"{file_name}_blurred{file_ext}")
-                
-                # Process the image with ImageMagick using Wand
-                with Image(filename=image_path) as img:
-                    # ぼかし処理を適用
-                    img.blur(radius=radius_float, sigma=sigma_float)
-                    # 処理した画像を保存
-                    img.save(filename=output_path)
-                
-                log_to_file(f"Image blurred successfully. Output saved to: {output_path}")
-                return [types.TextContent(type="text", text=f"Image blurred successfully. Output saved to: {output_path}")]
-            
-            # グレースケール変換処理
-            elif is_grayscale:
-                output_path = os.path.join(output_dir, f"{file_name}_grayscale{file_ext}")
-                
-                # Process the image with ImageMagick using Wand
-                with Image(filename=image_path) as img:
-                    # グレースケールに変換
-                    img.type = 'grayscale'
-                    # 処理した画像を保存
-                    img.save(filename=output_path)
-                
-                log_to_file(f"Image converted to grayscale successfully. Output saved to: {output_path}")
-                return [types.TextContent(type="text", text=f"Image converted to grayscale successfully. Output saved to: {output_path}")]
-            
-            # 画像情報取得処理
-            elif is_get_info:
-                # Process the image with ImageMagick using Wand
-                with Image(filename=image_path) as img:
-                    # 基本情報を取得
-                    image_info = {
-                        "filename": os.path.basename(image_path),
-                        "full_path": image_path,
-                        "format": img.format,
-                        "width": img.width,
-                        "height": img.height,
-                        "depth": img.depth,
-                        "colorspace": img.colorspace,
-                        "compression": img.compression,
-                        "resolution": {
-                            "x": getattr(img.resolution, 'x', None) if hasattr(img, 'resolution') else None,
-                            "y": getattr(img.resolution, 'y', None) if hasattr(img, 'resolution') else None
-                        },
-                        "file_size_bytes": os.path.getsize(image_path),
-                        "has_alpha": img.alpha_channel,
-                        "type": img.type
-                    }
-                    
-                    # ファイルサイズを人間が読める形式に変換
-                    file_size = image_info["file_size_bytes"]
-                    if file_size < 1024:
-                        size_str = f"{file_size} bytes"
-                    elif file_size < 1024 * 1024:
-                        size_str = f"{file_size / 1024:.1f} KB"
-                    else:
-                        size_str = f"{file_size / (1024 * 1024):.1f} MB"
-                    
-                    # 結果を整理して表示
-                    result_text = f"""Image Information:
-Filename: {image_info['filename']}
-Path: {image_info['full_path']}
-Format: {image_info['format']}
-Dimensions: {image_info['width']} x {image_info['height']} pixels
-Color Depth: {image_info['depth']} bits
-Colorspace: {image_info['colorspace']}
-Compression: {image_info['compression']}
-File Size: {size_str}
-Has Alpha Channel: {image_info['has_alpha']}
-Image Type: {image_info['type']}"""
-                    
-                    if image_info['resolution']['x'] and image_info['resolution']['y']:
-                        result_text += f"\nResolution: {image_info['resolution']['x']:.1f} x {image_info['resolution']['y']:.1f} DPI"
-                
-                log_to_file(f"Image information retrieved successfully for: {image_path}")
-                return [types.TextContent(type="text", text=result_text)]
+            # 引数全体のreprは大きな入力で高くつくため、書式化はDEBUGレベルが有効な場合のみ行われる
+            logger.debug("DEBUG: Raw input - name: %r, arguments: %r", name, arguments)
             
-            # フィルター適用処理
-            elif is_apply_filter:
-                # フィルター用パラメータの取得
-                filter_type = None
-                filter_strength = 1.0  # デフォルト値
-                
-                if arguments and isinstance(arguments, dict):
-                    if "filter_type" in arguments:
-                        filter_type = arguments.get("filter_type")
-                        log_to_file(f"DEBUG: Using filter_type from arguments: {filter_type}")
-                    if "filter_strength" in arguments:
-                        filter_strength = arguments.get("filter_strength")
-                        log_to_file(f"DEBUG: Using filter_strength from arguments: {filter_strength}")
-                
-                log_to_file(f"After argument processing - image_path: {image_path}, filter_type: {filter_type}, filter_strength: {filter_strength}")
-                
-                # パラメータの検証
-                if not filter_type:
-                    log_to_file(f"Error: No filter type specified")
-                    return [types.TextContent(type="text", text=f"Error: No filter type specified")]
-                
-                # フィルター強度の処理
-                try:
-                    strength_float = float(filter_strength) if filter_strength is not None else 1.0
-                    if strength_float < 0.0:
-                        strength_float = 0.0
-                        log_to_file(f"Filter strength out of range, using minimum: {strength_float}")
-                    elif strength_float > 10.0:
-                        strength_float = 10.0
-                        log_to_file(f"Filter strength out of range, using maximum: {strength_float}")
-                except (TypeError, ValueError) as e:
-                    log_to_file(f"Error converting filter_strength to float: {e}")
-                    strength_float = 1.0
-                
-                # 出力ファイル名の作成
-                output_path = os.path.join(output_dir, f"{file_name}_{filter_type}_filtered{file_ext}")
-                
-                # Process the image with ImageMagick using Wand
-                with Image(filename=image_path) as img:
-                    # フィルタータイプに応じて処理を実行
-                    if filter_type.lower() == "sharpen":
-                        # シャープネスフィルター
-                        img.sharpen(radius=0.0, sigma=strength_float)
-                    elif filter_type.lower() == "edge":
-                        # エッジ検出フィルター
-                        img.edge(radius=strength_float)
-                    elif filter_type.lower() == "emboss":
-                        # エンボスフィルター
-                        img.emboss(radius=strength_float, sigma=1.0)
-                    elif filter_type.lower() == "oil_paint":
-                        # 油絵風フィルター
-                        img.oil_paint(radius=strength_float)
-                    elif filter_type.lower() == "charcoal":
-                        # 木炭画風フィルター
-                        img.charcoal(radius=strength_float, sigma=1.0)
-                    elif filter_type.lower() == "sketch":
-                        # スケッチ風フィルター
-                        img.sketch(radius=strength_float, sigma=1.0, angle=45.0)
-                    elif filter_type.lower() == "wave":
-                        # 波形歪みフィルター
-                        img.wave(amplitude=strength_float * 5.0, wave_length=strength_float * 20.0)
-                    elif filter_type.lower() == "swirl":
-                        # 渦巻きフィルター
-                        img.swirl(degree=strength_float * 90.0)
-                    elif filter_type.lower() == "implode":
-                        # 内破フィルター
-                        img.implode(amount=strength_float * 0.5)
-                    elif filter_type.lower() == "solarize":
-                        # ソラリゼーションフィルター
-                        img.solarize(threshold=strength_float * 0.5)
-                    elif filter_type.lower() == "spread":
-                        # スプレッドフィルター
-                        img.spread(radius=strength_float * 3.0)
-                    elif filter_type.lower() == "noise":
-                        # ノイズ追加フィルター
-                        # Wandのノイズタイプを使用
-                        from wand.image import NOISE_TYPES
-                        noise_type = 'gaussian' if 'gaussian' in NOISE_TYPES else list(NOISE_TYPES.keys())[0]
-                        img.noise(noise_type, attenuate=strength_float)
-                    else:
-                        error_message = f"Error: Unknown filter type '{filter_type}'. Available filters: sharpen, edge, emboss, oil_paint, charcoal, sketch, wave, swirl, implode, solarize, spread, noise"
-                        log_to_file(error_message)
-                        return [types.TextContent(type="text", text=error_message)]
-                    
-                    # 処理した画像を保存
-                    img.save(filename=output_path)
-                
-                log_to_file(f"Filter '{filter_type}' applied successfully. Output saved to: {output_path}")
-                return [types.TextContent(type="text", text=f"Filter '{filter_type}' applied successfully. Output saved to: {output_path}")]
-            
-            # 色調変更処理
-            elif name == 'modify_colors':
-                # 色調変更用パラメータの取得
-                hue_shift = 0.0  # デフォルト値
-                brightness = 100.0  # デフォルト値
-                saturation = 100.0  # デフォルト値
-                
-                if arguments and isinstance(arguments, dict):
-                    if "hue_shift" in arguments:
-                        hue_shift = arguments.get("hue_shift")
-                        log_to_file(f"DEBUG: Using hue_shift from arguments: {hue_shift}")
-                    if "brightness" in arguments:
-                        brightness = arguments.get("brightness")
-                        log_to_file(f"DEBUG: Using brightness from arguments: {brightness}")
-                    if "saturation" in arguments:
-                        saturation = arguments.get("saturation")
-                        log_to_file(f"DEBUG: Using saturation from arguments: {saturation}")
-                
-                log_to_file(f"After argument processing - image_path: {image_path}, hue_shift: {hue_shift}, brightness: {brightness}, saturation: {saturation}")
-                
-                # パラメータの型変換と範囲チェック
-                # 色相変更量の処理
-                try:
-                    hue_shift_float = float(hue_shift) if hue_shift is not None else 0.0
-                    # 値を-360〜360の範囲に正規化
-                    while hue_shift_float < -360.0:
-                        hue_shift_float += 360.0
-                    while hue_shift_float > 360.0:
-                        hue_shift_float -= 360.0
-                except (TypeError, ValueError) as e:
-                    log_to_file(f"Error converting hue_shift to float: {e}")
-                    hue_shift_float = 0.0
-                
-                # 輝度の処理
-                try:
-                    brightness_float = float(brightness) if brightness is not None else 100.0
-                    if brightness_float < 0.0:
-                        brightness_float = 0.0
-                        log_to_file(f"Brightness value out of range, using minimum: {brightness_float}")
-                    elif brightness_float > 200.0:
-                        brightness_float = 200.0
-                        log_to_file(f"Brightness value out of range, using maximum: {brightness_float}")
-                except (TypeError, ValueError) as e:
-                    log_to_file(f"Error converting brightness to float: {e}")
-                    brightness_float = 100.0
-                
-                # 彩度の処理
-                try:
-                    saturation_float = float(saturation) if saturation is not None else 100.0
-                    if saturation_float < 0.0:
-                        saturation_float = 0.0
-                        log_to_file(f"Saturation value out of range, using minimum: {saturation_float}")
-                    elif saturation_float > 200.0:
-                        saturation_float = 200.0
-                        log_to_file(f"Saturation value out of range, using maximum: {saturation_float}")
-                except (TypeError, ValueError) as e:
-                    log_to_file(f"Error converting saturation to float: {e}")
-                    saturation_float = 100.0
-                
-                log_to_file(f"Using normalized values - hue_shift: {hue_shift_float}, brightness: {brightness_float}, saturation: {saturation_float}")
-                
-                output_path = os.path.join(output_dir, f"{file_name}_color_modified{file_ext}")
-                
-                # Process the image with ImageMagick using Wand
-                with Image(filename=image_path) as img:
-                    # 色相、輝度、彩度を変更
-                    # modulate関数のパラメータ:
-                    # - brightness: 輝度（0〜200、100が元の輝度）
-                    # - saturation: 彩度（0〜200、100が元の彩度）
-                    # - hue: 色相（0〜200、100が元の色相）
-                    # 色相の変更は100 + hue_shift * 100 / 360 で変換
-                    img.modulate(
-                        brightness=brightness_float,
-                        saturation=saturation_float,
-                        hue=100.0 + hue_shift_float * 100.0 / 360.0
-                    )
-                    # Save the processed image
-                    img.save(filename=output_path)
-                
-                log_to_file(f"Image colors modified successfully. Output saved to: {output_path}")
-                return [types.TextContent(type="text", text=f"Image colors modified successfully. Output saved to: {output_path}")]
-            
-            # 当てはまる機能がない場合はエラーを返す
-            else:
-                error_message = f"Error: Unknown tool name '{name}'. Available tools are: apply_filter, binarize_image, blur_image, convert_image_format, get_image_info, grayscale_image, modify_colors, resize_image"
+            # nameに対応する処理関数を取得
+            handler = TOOL_HANDLERS.get(name)
+            batch_handler = BATCH_TOOL_HANDLERS.get(name)
+            if handler is None and batch_handler is None:
+                error_message = f"Error: Unknown tool name '{name}'. Available tools are: {', '.join(sorted([*TOOL_HANDLERS, *BATCH_TOOL_HANDLERS]))}"
                 log_to_file(error_message)
                 return [types.TextContent(type="text", text=error_message)]
+            log_to_file(f"Detected {name} call")
+            
+            # 共通の引数処理（引数の形式はここで一度だけ正規化する）
+            arguments = normalize_arguments(arguments)
+            logger.debug("DEBUG: Processing arguments dictionary: %s", arguments)
+            if batch_handler is not None:
+                return await batch_handler(arguments)
+            return await call_image_tool(handler, arguments)
         except Exception as e:
             traceback_str = traceback.format_exc()
             log_to_file(f"Error in process_image: {traceback_str}")
@@ -575,187 +1691,18 @@ Image Type: {image_info['type']}"""
     @app.list_tools()
     async def list_tools() -> list[types.Tool]:
         """List the available tools for this MCP server."""
-        return [
-            types.Tool(
-                name="apply_filter",
-                description="Apply various image filters using ImageMagick",
-                inputSchema={
-                    "type": "object",
-                    "required": ["image_path", "filter_type"],
-                    "properties": {
-                        "image_path": {
-                            "type": "string",
-                            "description": "Path to the image file to apply filter to"
-                        },
-                        "filter_type": {
-                            "type": "string",
-                            "description": "Type of filter to apply (sharpen, edge, emboss, oil_paint, charcoal, sketch, wave, swirl, implode, solarize, spread, noise)"
-                        },
-                        "filter_strength": {
-                            "type": "number",
-                            "description": "Strength of the filter effect (0.0 to 10.0)",
-                            "default": 1.0
-                        }
-                    }
-                }
-            ),
-            types.Tool(
-                name="binarize_image",
-                description="Binarize an image using ImageMagick",
-                inputSchema={
-                    "type": "object",
-                    "required": ["image_path"],
-                    "properties": {
-                        "image_path": {
-                            "type": "string",
-                            "description": "Path to the image file to binarize"
-                        },
-                        "threshold": {
-                            "type": "number",
-                            "description": "Threshold value for binarization (0.0 to 1.0)",
-                            "default": 0.5
-                        }
-                    }
-                }
-            ),
-            types.Tool(
-                name="blur_image",
-                description="Blur an image using ImageMagick",
-                inputSchema={
-                    "type": "object",
-                    "required": ["image_path"],
-                    "properties": {
-                        "image_path": {
-                            "type": "string",
-                            "description": "Path to the image file to blur"
-                        },
-                        "radius": {
-                            "type": "number",
-                            "description": "Blur radius (0.0 or higher, 0.0 means auto-select)",
-                            "default": 0.0
-                        },
-                        "sigma": {
-                            "type": "number",
-                            "description": "Blur sigma - controls the blur strength (higher values create stronger blur)",
-                            "default": 3.0
-                        }
-                    }
-                }
-            ),
-            types.Tool(
-                name="convert_image_format",
-                description="Convert an image from one format to another (e.g., PNG to JPG, BMP to TGA)",
-                inputSchema={
-                    "type": "object",
-                    "required": ["image_path", "output_format"],
-                    "properties": {
-                        "image_path": {
-                            "type": "string",
-                            "description": "Path to the image file to convert"
-                        },
-                        "output_format": {
-                            "type": "string",
-                            "description": "Output format (e.g., jpg, png, tiff, bmp, tga, webp, etc.)"
-                        },
-                        "quality": {
-                            "type": "number",
-                            "description": "Quality for lossy formats like JPG (1-100, higher is better quality)",
-                            "default": 85
-                        }
-                    }
-                }
-            ),
-            types.Tool(
-                name="modify_colors",
-                description="Modify the colors (hue, brightness, saturation) of an image using ImageMagick",
-                inputSchema={
-                    "type": "object",
-                    "required": ["image_path"],
-                    "properties": {
-                        "image_path": {
-                            "type": "string",
-                            "description": "Path to the image file to modify"
-                        },
-                        "hue_shift": {
-                            "type": "number",
-                            "description": "Hue shift value in degrees (-360.0 to 360.0)",
-                            "default": 0.0
-                        },
-                        "brightness": {
-                            "type": "number",
-                            "description": "Brightness adjustment (0.0 to 200.0, 100.0 is original)",
-                            "default": 100.0
-                        },
-                        "saturation": {
-                            "type": "number",
-                            "description": "Saturation adjustment (0.0 to 200.0, 100.0 is original)",
-                            "default": 100.0
-                        }
-                    }
-                }
-            ),
-            types.Tool(
-                name="resize_image",
-                description="Resize an image using ImageMagick",
-                inputSchema={
-                    "type": "object",
-                    "required": ["image_path"],
-                    "properties": {
-                        "image_path": {
-                            "type": "string",
-                            "description": "Path to the image file to resize"
-                        },
-                        "width": {
-                            "type": "number",
-                            "description": "New width in pixels. If only width is specified, height will be calculated to maintain aspect ratio.",
-                            "default": None
-                        },
-                        "height": {
-                            "type": "number",
-                            "description": "New height in pixels. If only height is specified, width will be calculated to maintain aspect ratio.",
-                            "default": None
-                        },
-                        "scale": {
-                            "type": "number",
-                            "description": "Scale factor (e.g., 0.5 for half size, 2.0 for double size). If specified, width and height are ignored.",
-                            "default": None
-                        }
-                    }
-                }
-            ),
-            types.Tool(
-                name="grayscale_image",
-                description="Convert an image to grayscale using ImageMagick",
-                inputSchema={
-                    "type": "object",
-                    "required": ["image_path"],
-                    "properties": {
-                        "image_path": {
-                            "type": "string",
-                            "description": "Path to the image file to convert to grayscale"
-                        }
-                    }
-                }
-            ),
-            types.Tool(
-                name="get_image_info",
-                description="Get detailed information about an image using ImageMagick",
-                inputSchema={
-                    "type": "object",
-                    "required": ["image_path"],
-                    "properties": {
-                        "image_path": {
-                            "type": "string",
-                            "description": "Path to the image file to analyze"
-                        }
-                    }
-                }
-            )
-        ]
+        return TOOLS
 
     from mcp.server.stdio import stdio_server
 
     async def arun():
+        # MagickWandの初期化は最初の画像確保時まで遅延されるため、
+        # 最初のツール呼び出しの前にここで済ませておく
+        genesis()
+        # CapacityLimiterはイベントループ内で作成する
+        global wand_limiter
+        wand_limiter = anyio.CapacityLimiter(max_concurrency or os.cpu_count() or 1)
+        log_to_file(f"Maximum concurrent ImageMagick operations: {wand_limiter.total_tokens}")
         async with stdio_server() as streams:
             await app.run(
                 streams[0], streams[1], app.create_initialization_options()
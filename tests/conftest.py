@@ -0,0 +1,5 @@
+import os
+import sys
+
+# リポジトリ直下のimagemagick_server.pyをインポートできるようにする
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
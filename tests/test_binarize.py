@@ -0,0 +1,84 @@
+import os
+
+import anyio
+import pytest
+
+pytest.importorskip("mcp")
+# wandはインストールされていてもImageMagickのライブラリがなければImportErrorになる
+try:
+    import wand.image as wand_image
+except ImportError as e:
+    pytest.skip(f"wand is not usable: {e}", allow_module_level=True)
+
+import imagemagick_server
+
+
+def make_two_frame_gif(path):
+    """白と黒の2フレームからなるGIFを作成する"""
+    with wand_image.Image(width=8, height=8, pseudo="xc:white") as img:
+        with wand_image.Image(width=8, height=8, pseudo="xc:black") as frame:
+            img.sequence.append(frame)
+        img.format = "gif"
+        img.save(filename=str(path))
+
+
+def test_binarize_multi_frame_gif_writes_single_png(tmp_path):
+    gif_path = tmp_path / "anim.gif"
+    make_two_frame_gif(gif_path)
+
+    result = anyio.run(
+        imagemagick_server.handle_binarize_image,
+        str(gif_path), os.stat(gif_path), {"threshold": 0.5}
+    )
+
+    output_path = tmp_path / "anim_binarized.png"
+    assert not result[0].text.startswith("Error")
+    assert str(output_path) in result[0].text
+    assert output_path.exists()
+    # フレームごとの別名ファイル（anim_binarized-0.pngなど）は作られない
+    assert not list(tmp_path.glob("anim_binarized-*.png"))
+    with wand_image.Image(filename=str(output_path)) as out:
+        assert len(out.sequence) == 1
+
+
+def test_store_cached_result_skips_missing_output(tmp_path):
+    key = ("binarize_image", str(tmp_path / "missing.png"), 0)
+    imagemagick_server.store_cached_result(key, str(tmp_path / "missing_binarized.png"))
+    assert key not in imagemagick_server.result_cache
+
+
+def test_binarize_batch_reports_conflicting_outputs_per_item(tmp_path):
+    for ext in ("png", "gif"):
+        with wand_image.Image(width=8, height=8, pseudo="xc:gray") as img:
+            img.format = ext
+            img.save(filename=str(tmp_path / f"a.{ext}"))
+    paths = [str(tmp_path / "a.png"), str(tmp_path / "a.gif"), str(tmp_path / "a.png")]
+
+    result = anyio.run(imagemagick_server.handle_binarize_batch, {"image_paths": paths})
+
+    lines = result[0].text.splitlines()
+    assert lines[0] == "Binarized 1 of 2 images."
+    assert lines[1] == f"- {paths[0]} -> {tmp_path / 'a_binarized.png'}"
+    assert lines[2].startswith(f"- Error: {paths[1]}: output ")
+
+
+def test_binarize_cache_is_not_hit_after_output_is_overwritten(tmp_path):
+    # 左から右へ黒から白になるグラデーション（しきい値によって二値化結果が変わる）
+    image_path = tmp_path / "gradient.png"
+    with wand_image.Image(width=64, height=8, pseudo="gradient:black-white") as img:
+        img.rotate(90)
+        img.save(filename=str(image_path))
+    output_path = tmp_path / "gradient_binarized.png"
+
+    def binarize(threshold):
+        anyio.run(
+            imagemagick_server.handle_binarize_image,
+            str(image_path), os.stat(image_path), {"threshold": threshold}
+        )
+        return output_path.read_bytes()
+
+    low = binarize(0.3)
+    high = binarize(0.7)
+    assert low != high
+    # 同じ出力パスが別のしきい値の結果で上書きされているため、キャッシュを使わずに再処理する
+    assert binarize(0.3) == low